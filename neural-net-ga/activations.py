@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Sigmoid activation kernels
+# Every kernel takes an array of net inputs z and an optional out array
+# (which may be z itself, to evaluate in place) and returns the activations.
+# None of them overflows for large negative z the way 1/(1+exp(-z)) does.
+#   expit  scipy.special.expit, if scipy is installed (the default: fastest exact kernel)
+#   tanh   sigmoid(z) = (1 + tanh(z/2)) / 2, exact, numpy only; needs no temporaries
+#          in place (the default without scipy)
+#   table  linear interpolation in a precomputed table, for inference only, numpy only
+#          (error below 1e-6, saturates to 0 and 1 outside [-16, 16]; not faster than expit)
+# python benchmark.py sigmoid compares them on the network's own net inputs.
+
+import threading
+import numpy as np
+try:
+    from scipy.special import expit
+except ImportError:
+    expit = None
+
+
+def tanh_sigmoid(z, out=None):
+    """
+    sigmoid activation function for neurons, computed as (1 + tanh(z/2)) / 2
+    :param z: array of net inputs
+    :param out: array to write the activations to (may be z)
+    :return activations:
+    """
+    out = np.multiply(z, 0.5, out=out)
+    np.tanh(out, out=out)
+    out += 1
+    out *= 0.5
+    return out
+
+
+def expit_sigmoid(z, out=None):
+    """
+    sigmoid activation function from scipy
+    :param z: array of net inputs
+    :param out: array to write the activations to (may be z)
+    :return activations:
+    """
+    if expit is None:
+        raise ImportError("the expit sigmoid kernel needs scipy")
+    if out is None:
+        return expit(z)
+    return expit(z, out=out)
+
+
+class SigmoidTable(object):
+    """Sigmoid approximated by linear interpolation between precomputed values
+    Net inputs are turned into table positions arithmetically (no search), and the
+    table indices and looked up values go to scratch arrays kept per thread, so a call
+    with out= allocates nothing. Needs only numpy; slower than expit, and than the
+    tanh form for a single row, but faster than the tanh form on batches of rows.
+    Only for inference: the network is trained with an exact kernel."""
+
+    def __init__(self, limit=16.0, size=8193):
+        """
+        :param limit: table covers [-limit, limit]; outside it the activation is taken as 0 or 1
+        :param size: number of precomputed points
+        """
+        self.limit = limit
+        self.size = size
+        self.scale = (size - 1) / (2.0 * limit)
+        self.values = tanh_sigmoid(np.linspace(-limit, limit, size))
+        # end points saturate exactly, so clipped inputs come out as 0 and 1
+        self.values[0], self.values[-1] = 0.0, 1.0
+        self.slopes = np.append(np.diff(self.values), 0.0)
+        # single precision copies, so float32 activations are interpolated without upcasting
+        self.tables = {np.dtype(np.float64): (self.values, self.slopes),
+                       np.dtype(np.float32): (self.values.astype(np.float32), self.slopes.astype(np.float32))}
+        self.scratch = threading.local()
+
+    def scratch_arrays(self, z):
+        """
+        The calling thread's scratch arrays, grown as needed and reused across calls
+        :param z: array of net inputs
+        :return index array, looked up values array (views of the scratch arrays, shaped like z):
+        """
+        arrays = getattr(self.scratch, 'arrays', None)
+        if arrays is None:
+            arrays = self.scratch.arrays = {}
+        index, looked_up = arrays.get(z.dtype, (None, None))
+        if index is None or len(index) < z.size:
+            index, looked_up = arrays[z.dtype] = np.empty(z.size, dtype=np.intp), np.empty(z.size, dtype=z.dtype)
+        return index[:z.size].reshape(z.shape), looked_up[:z.size].reshape(z.shape)
+
+    def __call__(self, z, out=None):
+        """
+        :param z: array of net inputs
+        :param out: array to write the activations to (may be z)
+        :return activations:
+        """
+        position = np.multiply(z, self.scale, out=out)
+        position += self.limit * self.scale
+        np.maximum(position, 0, out=position)
+        np.minimum(position, self.size - 1, out=position)
+        values, slopes = self.tables.get(position.dtype, (self.values, self.slopes))
+        index, looked_up = self.scratch_arrays(position)
+        # table interval of each position, and the fractional part of the position within it
+        np.floor(position, out=looked_up)
+        np.copyto(index, looked_up, casting='unsafe')
+        position -= looked_up
+        # times the slope of the interval, plus the value at its start
+        # (mode='clip' takes straight into looked_up; the indices are in range)
+        np.take(slopes, index, out=looked_up, mode='clip')
+        position *= looked_up
+        np.take(values, index, out=looked_up, mode='clip')
+        position += looked_up
+        return position
+
+
+table_sigmoid = SigmoidTable()
+
+# kernel used for training and, unless another one is chosen, for inference
+sigmoid = expit_sigmoid if expit is not None else tanh_sigmoid
+
+
+def sigmoid_derivative(z):
+    """
+    The derivative of the sigmoid activation function is easily expressed in terms of the function itself:
+    d sigma(z)/dz = sigma(z)x(1 - sigma(z))
+    :param z: array of net inputs
+    :return derivatives:
+    """
+    s = sigmoid(z)
+    return s * (1 - s)
+
+
+#### kernels by name ####
+kernels = {'tanh': tanh_sigmoid, 'table': table_sigmoid}
+if expit is not None:
+    kernels['expit'] = expit_sigmoid
+
+
+def get_kernel(name):
+    """
+    :param name: 'expit', 'tanh' or 'table', or 'exact' for the default kernel
+    :return sigmoid kernel:
+    """
+    if name == 'exact':
+        return sigmoid
+    try:
+        return kernels[name]
+    except KeyError:
+        raise KeyError("no sigmoid kernel %r (available: %s)" % (name, ', '.join(sorted(kernels))))
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Benchmarks for the neural net pipeline
+# Each benchmark reports the time taken and checks the results against a reference.
+#   python benchmark.py dtype [epochs] [rows] [batch_size]
+#       train the network with float64 and float32 data, weights and activations
+#       from the same seed and initial weights, in minibatches of batch_size rows,
+#       and evaluate it on every training and test row; report accuracy parity and
+#       the speedup of each (batch_size 1 is online training, dominated by per-call overhead)
+#   python benchmark.py sigmoid
+#       time each sigmoid kernel (activations.py) on the network's real net inputs,
+#       one row at a time and for the whole training set, and report its error
+#   python benchmark.py backprop [rows]
+#       time network.back_propagation_batch against the per-weight loops it replaced,
+#       one training row at a time (test_network.py asserts that they agree)
+
+from __future__ import division
+import os
+import subprocess
+import sys
+import time
+import timeit
+
+import warnings
+warnings.simplefilter(action="ignore", category=FutureWarning)
+warnings.simplefilter(action="ignore", category=UserWarning)
+
+# shuffle seed and weight initialization seed shared by every run
+seed = 1
+
+
+######################################################################################################
+
+def train_with_dtype(dtype, epochs, rows, batch_size):
+    """
+    Train experiment 1's network (all features) on the first rows of the shuffled
+    training and test sets, with the pipeline's dtype set to dtype, then time a full
+    evaluation: forward passes over every training and test row, a chunk of rows at a time
+    The precision is fixed when the network modules are imported, so this runs in
+    a fresh interpreter (see main); weights start from the same random draw for every dtype.
+    :param dtype: 'float64' or 'float32'
+    :param epochs:
+    :param rows: number of training and test rows
+    :param batch_size: number of training rows per weight update
+    :return training accuracy list, testing accuracy list, seconds spent training,
+    seconds per full evaluation:
+    """
+    os.environ['NEURAL_NET_GA_DTYPE'] = dtype
+    os.environ['NEURAL_NET_GA_SEED'] = str(seed)
+    import numpy as np
+    np.random.seed(seed)
+    import experiment1_non_ga as experiment
+
+    letters = experiment.letters
+    assert letters.X.dtype == np.dtype(dtype)
+    training_batches = letters.batches(letters.training_order[0:rows], batch_size=batch_size)
+    testing_rows = letters.testing_order[0:rows]
+    testing_batches = [(letters.X_test[testing_rows], letters.X_test_classes[testing_rows],
+                        letters.X_test_output_targets[testing_rows])]
+
+    start = time.time()
+    training_acc_list, testing_acc_list = experiment.train(epochs, training_batches, testing_batches,
+                                                           batch_size=batch_size)
+    training_seconds = time.time() - start
+
+    trainer = experiment.create_trainer(letters.num_inputs)
+    evaluation_microseconds = time_call(lambda: (trainer.evaluate(letters.X, letters.X_classes),
+                                                 trainer.evaluate(letters.X_test, letters.X_test_classes)))
+    return training_acc_list, testing_acc_list, training_seconds, evaluation_microseconds / 1e6
+
+
+def dtype_benchmark(epochs=5, rows=2000, batch_size=50):
+    """
+    Compare float32 and float64 end to end: minibatch training and full evaluation
+    :param epochs:
+    :param rows:
+    :param batch_size:
+    """
+    results = {}
+    for dtype in ('float64', 'float32'):
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), 'dtype-run',
+                                          dtype, str(epochs), str(rows), str(batch_size)])
+        # the child reports its results on a line of their own, after its progress output
+        result_line = [line for line in output.splitlines() if line.startswith('result: ')][-1]
+        results[dtype] = eval(result_line[len('result: '):])
+
+    print "\n%d rows, batch size %d" % (rows, batch_size)
+    print "%-8s %-10s %-10s %-14s %s" % ('dtype', 'train acc', 'test acc', 'training s', 'evaluation s')
+    for dtype in ('float64', 'float32'):
+        training_acc_list, testing_acc_list, training_seconds, evaluation_seconds = results[dtype]
+        print "%-8s %-10.4f %-10.4f %-14.3f %.4f" % (dtype, training_acc_list[-1], testing_acc_list[-1],
+                                                     training_seconds, evaluation_seconds)
+    difference = max(abs(a - b) for a, b in zip(results['float64'][1], results['float32'][1]))
+    print "largest per-epoch test accuracy difference: %.4f" % difference
+    print "float32 speedup: training %.2fx, evaluation of every row %.2fx" % (
+        results['float64'][2] / results['float32'][2], results['float64'][3] / results['float32'][3])
+
+
+######################################################################################################
+
+def time_call(function, repeat=5):
+    """
+    :param function: function taking no arguments
+    :return best time per call in microseconds:
+    """
+    timer = timeit.Timer(function)
+    number = max(1, timer.timeit(1) and int(0.05 / max(timer.timeit(1), 1e-7)))
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def sigmoid_benchmark():
+    """
+    Time the sigmoid kernels, allocating and in place, on the net inputs of the
+    hidden and output layers (initial weights, scaled training data), for one row
+    (as in online training) and for every training row at once (as in forward_batch)
+    """
+    import numpy as np
+    np.random.seed(seed)
+    import activations
+    from neural_net_ga import letters, create_trainer
+
+    trainer = create_trainer(letters.num_inputs)
+    hidden_inputs = np.dot(letters.X, trainer.input_to_hidden_weights.T)
+    output_inputs = np.dot(activations.sigmoid(hidden_inputs), trainer.hidden_to_output_weights[:, :-1].T)
+    output_inputs += trainer.hidden_to_output_weights[:, -1]
+
+    def reference(z):
+        z = z.astype(np.longdouble)
+        return 1 / (1 + np.exp(-z))
+
+    def original(z, out=None):
+        return 1 / (1+np.exp(-z))
+
+    kernels = [('1/(1+exp(-z))', original)] + [(name, activations.kernels[name])
+                                                for name in ('tanh', 'expit', 'table') if name in activations.kernels]
+    shapes = [('hidden, 1 row', hidden_inputs[:1].T), ('output, 1 row', output_inputs[:1].T),
+              ('hidden, all rows', hidden_inputs), ('output, all rows', output_inputs)]
+
+    print "%-16s %-28s %10s %10s %10s" % ('kernel', 'net inputs', 'us/call', 'in place', 'max error')
+    for name, kernel in kernels:
+        for shape_name, z in shapes:
+            z = np.ascontiguousarray(z)
+            out = np.empty_like(z)
+            allocating = time_call(lambda: kernel(z))
+            in_place = '%10.2f' % time_call(lambda: kernel(z, out=out)) if kernel is not original else '%10s' % '-'
+            error = float(np.abs(kernel(z) - reference(z)).max())
+            print "%-16s %-28s %10.2f %s %10.1e" % (name, shape_name + ' ' + 'x'.join(map(str, z.shape)),
+                                                     allocating, in_place, error)
+
+    # large negative net inputs overflow exp(-z) in the original formula
+    with np.errstate(over='raise'):
+        for name, kernel in kernels:
+            try:
+                kernel(np.array([-1000.0]))
+                print "%-16s overflow-safe" % name
+            except FloatingPointError:
+                print "%-16s overflows for z = -1000" % name
+
+
+######################################################################################################
+
+def loop_back_propagation(hidden_activations, output_activations, output_layer_targets, rows,
+                          input_to_hidden_weights, hidden_to_output_weights, eta, alpha,
+                          input_to_hidden_deltas, hidden_to_output_deltas):
+    """
+    Reference: the experiments' original back-propagation, one weight at a time,
+    for a minibatch of rows (as network.back_propagation_batch): error terms per row,
+    weight changes Δw^t = η*mean(δ*x) + αΔw^(t−1) from the hidden -> output layer down,
+    with the previous changes kept in the delta buffers (as the original meant to, but
+    reset them for every example) and the hidden -> output bias weights trained
+    on an input of 1 (as the original did not)
+    :param hidden_activations, output_activations, output_layer_targets, rows: lists of one row per example
+    :param input_to_hidden_weights, hidden_to_output_weights: weights, updated in place
+    :param eta: learning rate
+    :param alpha: momentum
+    :param input_to_hidden_deltas, hidden_to_output_deltas: previous weight changes, updated in place
+    """
+    num_rows = len(rows)
+    num_hidden = len(hidden_activations[0])
+    num_outputs = len(output_activations[0])
+    output_layer_error = []
+    hidden_layer_error = []
+    for r in range(num_rows):
+        output = output_activations[r]
+        output_layer_error.append([output[k] * (1 - output[k]) * (output_layer_targets[r][k] - output[k])
+                                   for k in range(num_outputs)])
+        errors = []
+        for j in range(num_hidden):
+            output_sum = 0
+            for k in range(num_outputs):
+                output_sum += hidden_to_output_weights[k][j] * output_layer_error[r][k]
+            errors.append(hidden_activations[r][j] * (1 - hidden_activations[r][j]) * output_sum)
+        hidden_layer_error.append(errors)
+
+    for k in range(num_outputs):
+        for j in range(num_hidden + 1):
+            gradient = 0
+            for r in range(num_rows):
+                activation = hidden_activations[r][j] if j < num_hidden else 1
+                gradient += output_layer_error[r][k] * activation
+            delta = eta * gradient / num_rows + alpha * hidden_to_output_deltas[k][j]
+            hidden_to_output_deltas[k][j] = delta
+            hidden_to_output_weights[k][j] += delta
+    for j in range(num_hidden):
+        for i in range(len(rows[0])):
+            gradient = 0
+            for r in range(num_rows):
+                gradient += hidden_layer_error[r][j] * rows[r][i]
+            delta = eta * gradient / num_rows + alpha * input_to_hidden_deltas[j][i]
+            input_to_hidden_deltas[j][i] = delta
+            input_to_hidden_weights[j][i] += delta
+
+
+def backprop_benchmark(rows=100):
+    """
+    Train on the first rows of the shuffled training set, one row at a time with momentum,
+    with both implementations from the same initial weights, then compare the weights
+    and the time per example (test_network.py checks the two agree, minibatches included)
+    :param rows:
+    """
+    import numpy as np
+    np.random.seed(seed)
+    from neural_net_ga import letters, n, eta, alpha
+    from network import forward_batch, back_propagation_batch
+
+    input_to_hidden_weights = np.random.uniform(low= -.25, high= .25, size=(n, letters.num_inputs))
+    hidden_to_output_weights = np.random.uniform(low= -.25, high= .25, size=(letters.num_classes, n + 1))
+    training_rows = letters.training_order[0:rows]
+
+    def train(implementation):
+        weights = input_to_hidden_weights.copy(), hidden_to_output_weights.copy()
+        deltas = np.zeros_like(weights[0]), np.zeros_like(weights[1])
+        start = time.time()
+        for target_row in training_rows:
+            row = letters.X[target_row:target_row + 1]
+            hidden, output = forward_batch(row, *weights)
+            implementation(hidden, output, letters.X_output_targets[target_row:target_row + 1], row,
+                           *(weights + (eta, alpha) + deltas))
+        return weights, (time.time() - start) / len(training_rows) * 1e6
+
+    (loop_input_to_hidden, loop_hidden_to_output), loop_time = train(loop_back_propagation)
+    (input_to_hidden, hidden_to_output), vectorized_time = train(back_propagation_batch)
+    print "weights match after %d examples: %s" % (len(training_rows),
+                                                  np.allclose(loop_input_to_hidden, input_to_hidden) and
+                                                  np.allclose(loop_hidden_to_output, hidden_to_output))
+    print "%-12s %10s" % ('', 'us/example')
+    print "%-12s %10.1f" % ('loops', loop_time)
+    print "%-12s %10.1f" % ('vectorized', vectorized_time)
+    print "speedup: %.1fx" % (loop_time / vectorized_time)
+
+
+######################################################################################################
+
+if __name__ == '__main__':
+    args = sys.argv[1:] or ['dtype']
+    if args[0] == 'dtype':
+        dtype_benchmark(*[int(arg) for arg in args[1:]])
+    elif args[0] == 'sigmoid':
+        sigmoid_benchmark()
+    elif args[0] == 'backprop':
+        backprop_benchmark(*[int(arg) for arg in args[1:]])
+    elif args[0] == 'dtype-run':
+        sys.stdout.write('\nresult: %r\n' % (train_with_dtype(args[1], int(args[2]), int(args[3]), int(args[4])),))
+        sys.stdout.flush()
+    else:
+        sys.exit("unknown benchmark %r" % args[0])
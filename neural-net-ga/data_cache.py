@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Compiled on-disk copies of the text data sets
+# Parsing letter-recognition.data from text on every import dominates startup,
+# so the parsed arrays are written once to an uncompressed .npz file
+# and reused until the source file changes.
+
+import hashlib
+import os
+import numpy as np
+
+# bump when the layout of the cached arrays changes
+# so that stale caches from an older parser are rebuilt
+CACHE_VERSION = 2
+
+# compiled files live next to the code, out of version control (see .gitignore)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+
+def file_stat_key(path):
+    """
+    Cheap key for a source file, checked on every load
+    :param path:
+    :return (size in bytes, modification time):
+    """
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+
+def file_hash(path):
+    """
+    Content hash of a source file, only computed when size or mtime changed
+    :param path:
+    :return sha1 hex digest:
+    """
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def cache_path(path, tag):
+    """
+    :param path: source data file
+    :param tag: name of the compiled artifact (e.g. 'parsed')
+    :return path of the compiled file for path:
+    """
+    return os.path.join(CACHE_DIR, os.path.basename(path) + '.' + tag + '.npz')
+
+
+def make_dir(directory):
+    """
+    Create directory if it does not exist yet
+    :param directory:
+    """
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # another process created it first
+            if not os.path.isdir(directory):
+                raise
+
+
+def save_arrays(filename, arrays):
+    """
+    Write a dict of arrays to filename
+    Written to a temporary file and renamed so concurrent readers
+    never see a partially written cache
+    :param filename:
+    :param arrays:
+    """
+    make_dir(os.path.dirname(filename))
+    tmp_filename = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmp_filename, 'wb') as f:
+        np.savez(f, **arrays)
+    os.rename(tmp_filename, filename)
+
+
+def load_arrays(filename):
+    """
+    Read every array of an .npz file into memory
+    :param filename:
+    :return dict of arrays:
+    """
+    with np.load(filename) as npz:
+        return dict((name, npz[name]) for name in npz.files)
+
+
+def load_cached(path, build, tag='parsed', key=''):
+    """
+    Return the arrays built from the data file at path,
+    calling build(path) only if there is no valid compiled copy.
+    The compiled copy is keyed on the source file's size and mtime;
+    if either changed, the content hash decides whether it is still valid.
+    :param path: source data file
+    :param build: function taking path and returning a dict of arrays
+    :param tag: name of the compiled artifact
+    :param key: string describing any other inputs of build (e.g. split sizes)
+    :return dict of arrays, plus the source file's hash under 'sha1':
+    """
+    size, mtime = file_stat_key(path)
+    filename = cache_path(path, tag)
+
+    cached = None
+    if os.path.exists(filename):
+        try:
+            cached = load_arrays(filename)
+        except (IOError, ValueError):
+            # truncated or corrupt cache, rebuild below
+            cached = None
+    if cached is not None and int(cached['version']) == CACHE_VERSION and \
+            str(cached.get('key', '')) == key:
+        if int(cached['size']) == size and float(cached['mtime']) == mtime:
+            return cached
+        # file was touched or copied: reuse the arrays if the contents are the same
+        sha1 = file_hash(path)
+        if str(cached['sha1']) == sha1:
+            cached['size'], cached['mtime'] = np.array(size), np.array(mtime)
+            save_arrays(filename, cached)
+            return cached
+    else:
+        sha1 = file_hash(path)
+
+    arrays = build(path)
+    arrays['version'] = np.array(CACHE_VERSION)
+    arrays['size'] = np.array(size)
+    arrays['mtime'] = np.array(mtime)
+    arrays['sha1'] = np.array(sha1)
+    arrays['key'] = np.array(key)
+    save_arrays(filename, arrays)
+    return arrays
+
+
+######################################################################################################
+
+def shared_arrays(directory, source, build, key=''):
+    """
+    Memory-mapped arrays shared between processes
+    The first caller writes the arrays from build() into directory as .npy files;
+    every caller (including the first) gets read-only np.memmap views of them,
+    so N processes share one physical copy through the page cache.
+    The files are rebuilt if the source file's size or mtime, or key, changed.
+    :param directory: where the .npy files are kept
+    :param source: data file the arrays are derived from
+    :param build: function taking no arguments and returning a dict of arrays
+    :param key: string describing any other inputs of build (e.g. split sizes)
+    :return dict of read-only memory-mapped arrays:
+    """
+    size, mtime = file_stat_key(source)
+    index_file = os.path.join(directory, 'index.npz')
+
+    index = None
+    if os.path.exists(index_file):
+        try:
+            index = load_arrays(index_file)
+        except (IOError, ValueError):
+            index = None
+    if index is None or int(index['version']) != CACHE_VERSION or \
+            int(index['size']) != size or float(index['mtime']) != mtime or str(index['key']) != key:
+        arrays = build()
+        make_dir(directory)
+        for name, array in arrays.items():
+            filename = os.path.join(directory, name + '.npy')
+            tmp_filename = '%s.%d.tmp' % (filename, os.getpid())
+            with open(tmp_filename, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.rename(tmp_filename, filename)
+        # index is written last: its presence means every array is in place
+        index = {'names': np.array(sorted(arrays)), 'version': np.array(CACHE_VERSION),
+                 'size': np.array(size), 'mtime': np.array(mtime), 'key': np.array(key)}
+        save_arrays(index_file, index)
+
+    return dict((str(name), np.load(os.path.join(directory, str(name) + '.npy'), mmap_mode='r'))
+                for name in index['names'])
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Letter data set as a lazily loaded object
+# Nothing is read, split or scaled until an attribute is first used,
+# so importing the neural net or GA modules costs no data loading and
+# each process decides when (and whether) the data is materialized.
+
+from __future__ import division
+from registry import get_spec
+from data_cache import load_cached, shared_arrays
+import numpy as np
+
+# most training rows gathered into a minibatch source's buffers at a time (see RowBatches)
+GATHER_ROWS = 1000
+
+
+def output_targets(classes, num_classes=26, dtype=np.float64):
+    """
+    Target for each output unit, for each row:
+    for the node matching the row's letter, t = .9, otherwise t = .1
+    :param classes: class index of each row
+    :param num_classes: number of output units
+    :param dtype: numeric precision of the targets
+    :return rows x num_classes array:
+    """
+    targets = np.full((len(classes), num_classes), 0.1, dtype=dtype)
+    targets[np.arange(len(classes)), classes] = 0.9
+    return targets
+
+
+class lazy_property(object):
+    """Attribute computed by the decorated method on first access,
+    then stored on the instance so later accesses are plain lookups"""
+
+    def __init__(self, method):
+        self.method = method
+        self.__doc__ = method.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = self.method(instance)
+        instance.__dict__[self.method.__name__] = value
+        return value
+
+
+class RowBatches(object):
+    """Re-iterable source of (rows, classes, output targets) minibatches taken from matrices by row number
+    Rows are gathered from the matrices one chunk of whole minibatches at a time
+    (about GATHER_ROWS rows) as the chunk is reached, so an epoch's shuffled order
+    never makes a reordered copy of the training data, its classes or its targets."""
+
+    def __init__(self, data, classes, output_targets, rows, batch_size=1):
+        """
+        :param data: data matrix
+        :param classes: class index of every row of data
+        :param output_targets: output layer targets of every row of data
+        :param rows: row numbers of data, in the order they are trained on
+        :param batch_size: number of rows per weight update (every chunk but the last holds a whole number of them)
+        """
+        self.data = data
+        self.classes = classes
+        self.output_targets = output_targets
+        self.rows = rows
+        self.chunk_rows = batch_size * max(1, GATHER_ROWS // batch_size)
+
+    def __len__(self):
+        return (len(self.rows) + self.chunk_rows - 1) // self.chunk_rows
+
+    def __iter__(self):
+        for start in xrange(0, len(self.rows), self.chunk_rows):
+            chunk = self.rows[start:start + self.chunk_rows]
+            yield self.data[chunk], self.classes[chunk], self.output_targets[chunk]
+
+
+class Dataset(object):
+    """Registered data set (letter recognition by default) split into training and test halves
+    Attributes mirror the module globals the experiments were written against:
+    X, X_targets (training matrix with bias column, class label per row)
+    and X_test, X_test_targets (test matrix scaled with the training statistics),
+    in file order; training_order, testing_order and epoch_order() give the
+    seeded shuffled order of their rows.
+    For every row there is also its class index (X_classes, X_test_classes) and
+    its 0.1/0.9 output layer targets (X_output_targets, X_test_output_targets),
+    computed once here instead of per row in the training and evaluation loops.
+    The network and GA dimensions (num_inputs, num_classes, chromosome_length)
+    come from the registered descriptor or, where it does not state them, the data."""
+
+    def __init__(self, name='letter', path=None, training_rows=None, testing_rows=None, seed=None,
+                 dtype=np.float64, shared_dir=None):
+        """
+        :param name: registered data set name (see registry.py)
+        :param path: data file, if not the registered one
+        :param training_rows: number of rows, from the start of the file, used for training
+        (default: as registered, or the first half of the file)
+        :param testing_rows: number of rows following them used for testing
+        (default: as registered, or the rest of the file)
+        :param seed: seed for shuffling each half and each epoch
+        (None draws one, kept as the seed attribute so the run can be replayed)
+        :param dtype: numeric precision of the scaled matrices and targets (np.float64 or np.float32)
+        :param shared_dir: if given, keep the scaled matrices there as .npy files
+        and use read-only memory-mapped views, shared between processes
+        """
+        self.spec = get_spec(name)
+        self.name = name
+        self.path = path if path is not None else self.spec.path
+        if seed is not None:
+            self.seed = seed
+        # whether the seed was given, so a later run with the same seed replays this one's shuffles
+        self.seeded = seed is not None
+        self.dtype = np.dtype(dtype)
+        self.shared_dir = shared_dir
+        if training_rows is not None:
+            self.training_rows = training_rows
+        elif self.spec.training_rows is not None:
+            self.training_rows = self.spec.training_rows
+        if testing_rows is not None:
+            self.testing_rows = testing_rows
+        elif self.spec.testing_rows is not None:
+            self.testing_rows = self.spec.testing_rows
+
+    #### raw data ####
+    @lazy_property
+    def arrays(self):
+        """parsed arrays for the whole file, from the compiled copy if there is one
+        (one per registered data set, so specs parsing the same file differently never share it)"""
+        return load_cached(self.path, self.spec.parse_file, tag='parsed-' + self.name, key=self.spec.cache_key)
+
+    @lazy_property
+    def features(self):
+        """feature block for the whole file"""
+        return self.arrays['features']
+
+    @lazy_property
+    def labels(self):
+        """class index for every row of the file"""
+        return self.arrays['labels']
+
+    @lazy_property
+    def training_rows(self):
+        """default split: first half of the file for training"""
+        return len(self.labels) // 2
+
+    @lazy_property
+    def testing_rows(self):
+        """default split: rows after the training rows for testing"""
+        return len(self.labels) - self.training_rows
+
+    #### dimensions of the network and GA chromosome ####
+    @lazy_property
+    def class_names(self):
+        """class label for each output unit"""
+        if self.spec.class_names is not None:
+            return np.array(self.spec.class_names)
+        return self.arrays['class_names']
+
+    @lazy_property
+    def num_features(self):
+        """number of feature columns"""
+        if self.spec.num_features is not None:
+            return self.spec.num_features
+        return self.features.shape[1]
+
+    @property
+    def num_inputs(self):
+        """width of the network input: the features plus the bias input"""
+        return self.num_features + 1
+
+    @property
+    def num_classes(self):
+        """number of output units"""
+        return len(self.class_names)
+
+    @property
+    def chromosome_length(self):
+        """one GA gene per network input (the last one, for the bias input, is always 1)"""
+        return self.num_inputs
+
+    #### split data in half for training and testing, shuffle each half ####
+    # The split is positional (training rows first, test rows after them) so X and
+    # X_test are views of one matrix; shuffling is expressed as seeded permutations
+    # of row numbers into them, so no data is copied or reordered in memory
+    # (training gathers one chunk of minibatches at a time, see RowBatches)
+    # and any run's row order can be replayed from its seed.
+    @lazy_property
+    def seed(self):
+        """seed of this run's shuffles, drawn at random if none was given (record it to replay the run)"""
+        return int(np.random.randint(0, 2 ** 31 - 1))
+
+    @lazy_property
+    def training_order(self):
+        """row numbers of X in training order"""
+        self.training_order, self.testing_order = self.split()
+        return self.training_order
+
+    @lazy_property
+    def testing_order(self):
+        """row numbers of X_test in testing order"""
+        self.training_order, self.testing_order = self.split()
+        return self.testing_order
+
+    def split(self):
+        """
+        :return seeded permutations of the row numbers of X and of X_test:
+        """
+        random_state = np.random.RandomState(self.seed)
+        return random_state.permutation(self.training_rows), random_state.permutation(self.testing_rows)
+
+    def epoch_order(self, epoch, rows=None):
+        """
+        Reshuffle rows for an epoch
+        The permutation depends only on the seed and the epoch number,
+        so every epoch of a run can be replayed on its own.
+        :param epoch: epoch number
+        :param rows: row numbers of X to reshuffle (default: training_order)
+        :return rows in this epoch's order:
+        """
+        if rows is None:
+            rows = self.training_order
+        random_state = np.random.RandomState([self.seed, epoch])
+        return rows[random_state.permutation(len(rows))]
+
+    def sample(self, rows, size):
+        """
+        Fixed random sample of rows, e.g. to monitor training on fewer rows than it uses
+        The sample depends only on the seed and the rows, so every epoch
+        (and every replay of the run) is evaluated on the same rows.
+        :param rows: row numbers
+        :param size: number of rows in the sample (every row if there are not more)
+        :return sampled row numbers, in ascending order:
+        """
+        if size is None or size >= len(rows):
+            return rows
+        random_state = np.random.RandomState([self.seed, len(rows), size])
+        return np.sort(random_state.choice(rows, size, replace=False))
+
+    def batches(self, rows, data=None, batch_size=1):
+        """
+        Training rows as (rows, classes, output targets) minibatches,
+        the same protocol stream.MinibatchReader follows
+        :param rows: row numbers of X, in the order they are trained on
+        :param data: matrix to take the rows from, if not X (e.g. a feature subset of X)
+        :param batch_size: number of rows per weight update
+        :return RowBatches, gathering the rows a chunk at a time:
+        """
+        if data is None:
+            data = self.X
+        return RowBatches(data, self.X_classes, self.X_output_targets, rows, batch_size)
+
+    def epoch_batches(self, rows, data=None, batch_size=1):
+        """
+        Training minibatches for network.train_epochs
+        :param rows: row numbers of X to train on
+        :param data: matrix to take the rows from, if not X (e.g. a feature subset of X)
+        :param batch_size: number of rows per weight update
+        :return function taking an epoch number and returning the rows' minibatches, reshuffled for that epoch:
+        """
+        return lambda epoch: self.batches(self.epoch_order(epoch, rows), data, batch_size)
+
+    def evaluator(self, trainer, training_rows, testing_rows, data=None, test_data=None):
+        """
+        Evaluation function for network.train_epochs: the network's votes for rows of X and X_test,
+        or for a fixed sample of them (see sample)
+        :param trainer: network being trained
+        :param training_rows, testing_rows: row numbers of X and X_test to evaluate
+        :param data, test_data: matrices to take the rows from, if not X and X_test (e.g. a feature subset of them)
+        :return function taking (training, sample_size) and returning the (training, test) evaluation.Evaluation:
+        """
+        if data is None:
+            data = self.X
+        if test_data is None:
+            test_data = self.X_test
+
+        def evaluate(training, sample_size):
+            # the neural net's vote for a row is its highest valued output unit;
+            # rows are forward propagated a chunk at a time (see Trainer.predict)
+            training_evaluation = None
+            if training:
+                training_evaluation = trainer.evaluate(data, self.X_classes, self.sample(training_rows, sample_size))
+            return training_evaluation, trainer.evaluate(test_data, self.X_test_classes,
+                                                         self.sample(testing_rows, sample_size))
+        return evaluate
+
+    #### scaled matrices ####
+    @property
+    def cache_key(self):
+        """everything besides the data file that the scaled matrices depend on"""
+        return '%s,%d,%d,%s' % (self.name, self.training_rows, self.testing_rows, self.dtype.name)
+
+    @lazy_property
+    def preprocessed(self):
+        """dict of the scaler statistics and matrices from build_matrices(),
+        read from the persisted artifact if it matches the data file and cache_key,
+        otherwise built and saved for every later run and experiment module
+        (one artifact per cache_key, so alternating splits or dtypes do not overwrite each other's)"""
+        return load_cached(self.path, lambda path: self.build_matrices(),
+                           tag='preprocessed-' + self.cache_key.replace(',', '-'), key=self.cache_key)
+
+    @lazy_property
+    def matrices(self):
+        """dict of the preprocessed matrices, loaded or mapped on first use"""
+        if self.shared_dir:
+            return shared_arrays(self.shared_dir, self.path, lambda: self.preprocessed, self.cache_key)
+        return self.preprocessed
+
+    @property
+    def mean(self):
+        """per feature mean of the training rows, subtracted from every row"""
+        return self.matrices['mean']
+
+    @property
+    def std(self):
+        """per feature standard deviation of the training rows, every row is divided by"""
+        return self.matrices['std']
+
+    @property
+    def X(self):
+        return self.matrices['data'][:self.training_rows]
+
+    @property
+    def X_targets(self):
+        return self.matrices['targets'][:self.training_rows]
+
+    @property
+    def X_test(self):
+        return self.matrices['data'][self.training_rows:]
+
+    @property
+    def X_test_targets(self):
+        return self.matrices['targets'][self.training_rows:]
+
+    @property
+    def X_classes(self):
+        return self.matrices['classes'][:self.training_rows]
+
+    @property
+    def X_test_classes(self):
+        return self.matrices['classes'][self.training_rows:]
+
+    @property
+    def X_output_targets(self):
+        return self.matrices['output_targets'][:self.training_rows]
+
+    @property
+    def X_test_output_targets(self):
+        return self.matrices['output_targets'][self.training_rows:]
+
+    def build_matrices(self):
+        """
+        Build the scaled data matrix (with bias input column) and the targets for each of its rows
+        The training rows come first and the test rows after them; both are scaled
+        with the training statistics.
+        :return dict of the scaler mean and std, data and its targets, class indices and output layer targets:
+        """
+        num_rows = self.training_rows + self.testing_rows
+        num_features = self.features.shape[1]
+        attributes = self.features[:num_rows]
+
+        #### save targets in the order entered into the matrix ####
+        classes = self.labels[:num_rows].astype(np.intp)
+        targets = self.class_names.reshape(-1, 1)[classes]
+
+        #### Data as a rows x (features+1) matrix ####
+        # Rows in data matrices correspond to number of items in minibatch
+        # columns correspond to values of these items (values of xi for all items X in training data)
+        # numpy stores data in row major order
+        # allocated once with room for the bias input, which goes at the end so we don't need
+        # to worry about indexing [1:25] when going from hidden -> output layer
+        data = np.empty((num_rows, num_features + 1), dtype=self.dtype)
+
+        #### preprocessing input, written into data in place ####
+        # scaled to be Gaussian with zero mean and unit variance along each column (feature)
+        # Scale the test data using the μi and σi values
+        # computed from the training data, not the test data.
+        # Statistics are computed in double precision, then the result is stored in dtype
+        mean = attributes[:self.training_rows].mean(axis=0)
+        std = attributes[:self.training_rows].std(axis=0)
+        # constant features are left unscaled (as preprocessing.scale did)
+        std[std == 0.0] = 1.0
+        np.subtract(attributes, mean, out=data[:, :num_features])
+        data[:, :num_features] /= std
+
+        #### 1s needed for bias inputs ####
+        data[:, num_features] = 1.0
+
+        return {'mean': mean, 'std': std, 'data': data, 'targets': targets, 'classes': classes,
+                'output_targets': output_targets(classes, self.num_classes, self.dtype)}
+
+
+#### data sets already created in this process ####
+datasets = {}
+
+
+def get_dataset(name='letter', path=None, training_rows=None, testing_rows=None, seed=None, dtype=np.float64,
+                shared_dir=None):
+    """
+    Dataset for these arguments, created once per process
+    and shared by every module that asks for it
+    :param name, path, training_rows, testing_rows, seed, dtype, shared_dir: see Dataset
+    :return Dataset:
+    """
+    key = (name, path, training_rows, testing_rows, seed, np.dtype(dtype), shared_dir)
+    if key not in datasets:
+        datasets[key] = Dataset(name, path, training_rows, testing_rows, seed, dtype, shared_dir)
+    return datasets[key]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Evaluation of the network's votes against the true classes
+# Everything is derived from one confusion matrix, counted with a single
+# np.bincount over true class * number of classes + vote, so per-class
+# precision and recall come at no extra cost over the accuracy.
+
+from __future__ import division
+import numpy as np
+
+
+def confusion_matrix(classes, votes, num_classes):
+    """
+    :param classes: true class index of every row
+    :param votes: the network's vote (class index) for every row
+    :param num_classes: number of classes
+    :return num_classes x num_classes matrix of counts, true classes in rows and votes in columns:
+    """
+    pairs = np.asarray(classes, dtype=np.intp) * num_classes + votes
+    return np.bincount(pairs, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def is_evaluation_epoch(epoch, num_epochs, evaluate_every=1):
+    """
+    Whether to evaluate the network after an epoch: every evaluate_every epochs,
+    and always after the last one
+    :param epoch: number of epochs completed (1 to num_epochs)
+    :param num_epochs: number of epochs in the run
+    :param evaluate_every: evaluation cadence in epochs (None or 0: only after the last epoch)
+    :return bool:
+    """
+    return epoch == num_epochs or bool(evaluate_every) and epoch % evaluate_every == 0
+
+
+def evaluation_epochs(num_epochs, evaluate_every=1):
+    """
+    :return the epochs (1 to num_epochs) a run evaluates after, in order:
+    """
+    return [epoch for epoch in xrange(1, num_epochs + 1) if is_evaluation_epoch(epoch, num_epochs, evaluate_every)]
+
+
+class Evaluation(object):
+    """Confusion matrix of a set of rows, with the accuracy and per-class scores it gives
+    (and the network's summed error on the rows, when it was computed)
+    Evaluations of separate batches of rows add up to the evaluation of all of them."""
+
+    def __init__(self, confusion, loss=None):
+        """
+        :param confusion: confusion matrix (see confusion_matrix)
+        :param loss: sum over the rows of the error E = 1/2 * sum over output units of (t - o)^2, if known
+        """
+        self.confusion = confusion
+        self.loss = loss
+
+    @classmethod
+    def of_votes(cls, classes, votes, num_classes, loss=None):
+        """
+        :param classes: true class index of every row
+        :param votes: the network's vote for every row
+        :param num_classes:
+        :param loss: summed error on the rows, if known
+        :return Evaluation:
+        """
+        return cls(confusion_matrix(classes, votes, num_classes), loss)
+
+    def __add__(self, other):
+        loss = None if self.loss is None or other.loss is None else self.loss + other.loss
+        return Evaluation(self.confusion + other.confusion, loss)
+
+    @property
+    def num_rows(self):
+        return int(self.confusion.sum())
+
+    @property
+    def correct(self):
+        """number of rows voted for their own class"""
+        return np.trace(self.confusion)
+
+    @property
+    def accuracy(self):
+        return self.correct / self.num_rows
+
+    @property
+    def mean_loss(self):
+        """error per row (None if the loss was not computed)"""
+        return None if self.loss is None else self.loss / self.num_rows
+
+    @property
+    def precision(self):
+        """per class: fraction of the votes for the class that were right (0 if it got no votes)"""
+        return np.diagonal(self.confusion) / np.maximum(self.confusion.sum(axis=0), 1)
+
+    @property
+    def recall(self):
+        """per class: fraction of the rows of the class voted for it (0 if no row has the class)"""
+        return np.diagonal(self.confusion) / np.maximum(self.confusion.sum(axis=1), 1)
+
+    def __repr__(self):
+        return 'Evaluation(accuracy=%.4f, rows=%d)' % (self.accuracy, self.num_rows)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Fitness of GA feature selection strings: accuracy of a network trained on the selected features
+# Every fitness evaluation is a training run, and small populations over the
+# 2^16 feature masks keep producing the same chromosomes, so fitness values are
+# memoized on (mask, hyperparameters, epochs, seed): in memory, least recently
+# used masks being dropped past a number of entries, and, for runs with a given
+# seed, in an sqlite file, so no chromosome is trained twice across generations,
+# rounds or runs replaying that seed.
+
+from collections import OrderedDict
+import os
+import sqlite3
+import threading
+import numpy as np
+from data_cache import CACHE_DIR, file_hash, make_dir
+from dataset import lazy_property
+from network import Trainer
+from subset_cache import SubsetCache, selected_columns
+
+# bump when the way fitness is computed changes,
+# so that fitness values stored by an older version are not reused
+FITNESS_VERSION = 1
+
+# default on-disk store, next to the compiled data sets (out of version control)
+FITNESS_CACHE_PATH = os.path.join(CACHE_DIR, 'fitness.sqlite')
+
+# default number of fitness values kept in memory
+CACHE_ENTRIES = 4096
+
+
+class FitnessCache(object):
+    """Fitness values keyed on strings: an in-memory LRU in front of an sqlite table
+    Values are written through to the table as they are computed, so later runs
+    (and other processes using the same file) find them. Safe to share between
+    threads: one lock guards the LRU and the sqlite connection."""
+
+    def __init__(self, path=FITNESS_CACHE_PATH, max_entries=CACHE_ENTRIES):
+        """
+        :param path: sqlite file (None: keep the values in memory only)
+        :param max_entries: most fitness values kept in memory at once
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.connection = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def connect(self):
+        """
+        Call with the lock held
+        :return connection to the sqlite file, opened (and its table created) on first use:
+        """
+        if self.connection is None:
+            make_dir(os.path.dirname(os.path.abspath(self.path)))
+            # wait for other processes writing to the same file rather than failing;
+            # used by every thread, one at a time under the lock
+            self.connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            with self.connection:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS fitness (key TEXT PRIMARY KEY, value REAL)')
+        return self.connection
+
+    def get(self, key, on_disk=True):
+        """
+        :param key:
+        :param on_disk: False to look in memory only (for keys no other run can have stored)
+        :return the fitness stored under key, or None:
+        """
+        with self.lock:
+            value = self.entries.pop(key, None)
+            if value is not None:
+                self.hits += 1
+            elif self.path is not None and on_disk:
+                row = self.connect().execute('SELECT value FROM fitness WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    value = row[0]
+            if value is None:
+                self.misses += 1
+                return None
+            self.store(key, value)
+            return value
+
+    def put(self, key, value, on_disk=True):
+        """
+        Store a newly computed fitness in memory and on disk
+        :param key:
+        :param value:
+        :param on_disk: False to keep it in memory only (for keys no later run can look up)
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+            self.store(key, value)
+            if self.path is not None and on_disk:
+                with self.connect() as connection:
+                    connection.execute('INSERT OR REPLACE INTO fitness (key, value) VALUES (?, ?)', (key, value))
+
+    def store(self, key, value):
+        """
+        Make key the most recently used entry, evicting the least recently used
+        entries past max_entries (they stay on disk); call with the lock held
+        :param key:
+        :param value:
+        """
+        while self.entries and len(self.entries) >= self.max_entries:
+            self.entries.popitem(last=False)
+        self.entries[key] = value
+
+    def clear(self):
+        """forget the values kept in memory (not the ones on disk)"""
+        with self.lock:
+            self.entries.clear()
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+class NetworkFitness(object):
+    """GA fitness function (toolbox "evaluate"): accuracy of a network trained on the
+    features a chromosome selects, on training rows held out from its training
+    The run is deterministic given the data set's seed (row orders and initial weights
+    are drawn from it), so its result is cached and reused whenever the chromosome
+    comes back with the same hyperparameters: in memory, and on disk only if the
+    seed was given (a drawn seed is never drawn again, so no later run could use it)."""
+
+    def __init__(self, dataset, num_hidden, eta, alpha, epochs=10, num_rows=500, batch_size=1, cache=None,
+                 sigmoid=None, subset_cache=None):
+        """
+        :param dataset: Dataset to train and score on
+        :param num_hidden: number of hidden units
+        :param eta: learning rate
+        :param alpha: momentum
+        :param epochs: number of epochs each chromosome is trained for
+        :param num_rows: number of training rows trained on, and number of the following training rows scored on
+        (at most half the training set each)
+        :param batch_size: number of training instances per weight update
+        :param cache: FitnessCache (None: a memory-only one)
+        :param sigmoid: sigmoid kernel used to score the network (None: the training kernel)
+        :param subset_cache: subset_cache.SubsetCache of the dataset's feature subsets to train on
+        (None: one of this fitness function's own)
+        """
+        self.dataset = dataset
+        self.num_hidden = num_hidden
+        self.eta = eta
+        self.alpha = alpha
+        self.epochs = epochs
+        self.num_rows = num_rows
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else FitnessCache(None)
+        self.sigmoid = sigmoid
+        self.subset_cache = subset_cache if subset_cache is not None else SubsetCache(dataset)
+
+    @lazy_property
+    def rows(self):
+        """
+        training rows trained on and the following training rows scored on:
+        num_rows of each, or half the training set each if it has fewer than 2 * num_rows rows
+        """
+        dataset = self.dataset
+        num_rows = min(self.num_rows, dataset.training_rows // 2)
+        if not num_rows:
+            raise ValueError("%d training rows: too few to train a network on and score it"
+                             % dataset.training_rows)
+        return dataset.training_order[0:num_rows], dataset.training_order[num_rows:2 * num_rows]
+
+    @lazy_property
+    def hyperparameters(self):
+        """everything besides the mask, epochs and seed that the fitness depends on, as part of its cache key"""
+        return 'v%d,%s,%s,%d,%r,%r,%d,%d,%s' % (FITNESS_VERSION, self.dataset.cache_key, file_hash(self.dataset.path),
+                                                self.num_hidden, self.eta, self.alpha, len(self.rows[0]),
+                                                self.batch_size,
+                                                getattr(self.sigmoid, '__name__', type(self.sigmoid).__name__))
+
+    def key(self, individual):
+        """
+        :param individual: feature selection string
+        :return cache key of the individual's fitness: (bitmask, hyperparameters, epochs, seed):
+        """
+        mask = ''.join('1' if gene else '0' for gene in individual)
+        return '%s|%s|%d|%d' % (mask, self.hyperparameters, self.epochs, self.dataset.seed)
+
+    def __call__(self, individual):
+        """
+        :param individual: feature selection string
+        :return (fitness,): accuracy on the held-out rows, from the cache if this mask was trained before
+        """
+        key = self.key(individual)
+        fitness = self.cache.get(key, self.dataset.seeded)
+        if fitness is None:
+            fitness = self.train(individual)
+            self.cache.put(key, fitness, self.dataset.seeded)
+        return fitness,
+
+    def train(self, individual):
+        """
+        Train a new network on the individual's features and score it
+        :param individual: feature selection string
+        :return accuracy on the held-out training rows:
+        """
+        columns = selected_columns([individual])
+        if not len(columns):
+            return 0.0
+        dataset = self.dataset
+        training_rows, scoring_rows = self.rows
+        # the training matrix of the individual's feature subset, shared with every other
+        # run on the same features (only the epochs' chunks of rows are gathered from it)
+        subset_training, subset_test = self.subset_cache.get([individual])
+        kwargs = {} if self.sigmoid is None else {'sigmoid': self.sigmoid}
+        trainer = Trainer.with_random_weights(len(columns), self.num_hidden, dataset.num_classes, self.eta,
+                                              self.alpha, dtype=dataset.dtype,
+                                              random_state=np.random.RandomState(dataset.seed), **kwargs)
+        for epoch in xrange(self.epochs):
+            for rows, classes, output_targets in dataset.batches(dataset.epoch_order(epoch, training_rows),
+                                                                 subset_training, self.batch_size):
+                trainer.train_rows(rows, output_targets, self.batch_size)
+        return float(trainer.accuracy(subset_training, dataset.X_classes, scoring_rows))
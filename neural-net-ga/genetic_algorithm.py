@@ -9,7 +9,6 @@
 import deap
 from deap import creator, base, tools, algorithms
 import random
-from neural_net_ga import *
 
 ####################
 # Program parameters
@@ -48,6 +47,20 @@ toolbox.register("individual", tools.initRepeat, creator.Individual,
                  toolbox.attribute, n=IND_SIZE)
 toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
+
+def set_chromosome_length(length):
+    """
+    Change the length of the feature selection strings
+    One gene per neural net input: the data set's features + 1 for bias
+    (see Dataset.chromosome_length)
+    :param length:
+    """
+    global IND_SIZE
+    IND_SIZE = length
+    toolbox.register("individual", tools.initRepeat, creator.Individual,
+                     toolbox.attribute, n=IND_SIZE)
+    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+
 # Operators
 # Operators are just like initalizers, excepted that some are already implemented in the tools module.
 # Create and register operators with the toolbox:
@@ -62,6 +75,15 @@ toolbox.register("mutate", tools.mutGaussian, mu=0, sigma=1, indpb=0.1)
 toolbox.register("select", tools.selTournament, tournsize=3)
 toolbox.register("evaluate", evaluate)
 
+
+def set_fitness(fitness):
+    """
+    Change the fitness function of the feature selection strings
+    (e.g. fitness.NetworkFitness, the accuracy of a network trained on the selected features)
+    :param fitness: function taking an individual and returning a tuple of one fitness value
+    """
+    toolbox.register("evaluate", fitness)
+
 ###############################################################################
 
 ##############
@@ -289,6 +311,7 @@ def create_gen_population():
     # Population
     # 16 features in row of X (neural net input) + 1 for bias
     # use 17 for number of population in GA: pop will be dim 1x17
+    # (IND_SIZE, see set_chromosome_length() for other data sets)
     #############################################################
     # ga_population = gen_algorithm(1)
     ga_population = initial_ga_population(1)
@@ -311,15 +334,15 @@ def create_gen_population():
 #######################################################################
 def genetic_algorithm(population):
     """
-    Run genetic cross on parents and mutate offspring
+    Run genetic cross on each string and mutate its offspring,
+    keeping whichever of the string and its offspring is fitter (toolbox "evaluate")
     Uses a mix of DEAP library and original functions
-    :param ga_population:
-    :param ga_population_deux:
-    :return:
+    :param population: feature selection strings (see create_gen_population)
+    :return population of the fittest strings found, one per string of population:
     """
-    # need to create population here
-    # or fitness evaluation fails after the first genetic algorithm run-through
-    population = create_gen_population()
+    # evolve copies, so the strings passed in (e.g. the initial population of every round) are left as they are
+    # (an initial population is created if none is passed in)
+    population = [creator.Individual(ind) for ind in population] or create_gen_population()
     # print "population in genetic_algorithm:\n", type(population)
     # Evaluate the entire population
     fitnesses = map(toolbox.evaluate, population)
@@ -329,39 +352,34 @@ def genetic_algorithm(population):
 
     # run for NGEN number of generations
     for g in range(NGEN):
-        # Select the next generation individuals
-        # offspring = toolbox.select(population, len(population))
-        # # Clone the selected individuals
-        # offspring = map(toolbox.clone, offspring)
-        # # print "offspring:\n", offspring
-
-        # subdivide population for genetic cross
-        sub_pop_one = population[0][::2]  # get every second item of population
-        sub_pop_two = population[0][1::2]
-
-        # apply crossover
-        ga_population_crossed = genetic_cross(sub_pop_one, sub_pop_two)
-        # add last digit for neural net bias
-        ga_population_crossed[0].append(1)
-        # print "Genetic cross:\n", ga_population_crossed
-        # print "len genetic cross:", len(ga_population_crossed[0])
-
-        # time to mutate!
-        ga_population_mutated = mutate(ga_population_crossed)
-        # overwrite last digit for neural net bias
-        ga_population_mutated[-1][-1] = 1
-        # print "Mutated:\n", ga_population_mutated
-
-        # print "orig len", len(ga_population[0])
-        # print "mutated len", len(ga_population_mutated[0])
-
-        # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in population if not ind.fitness.valid]
-        fitnesses = map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
-
-    return ga_population_mutated
+        for i, ind in enumerate(population):
+            # subdivide the string for genetic cross
+            sub_pop_one = ind[::2]  # get every second item of the string
+            sub_pop_two = ind[1::2]
+
+            # apply crossover
+            ga_population_crossed = genetic_cross(sub_pop_one, sub_pop_two)
+            # add last digit for neural net bias
+            # (for an even chromosome length the cross is one gene too long: drop its last gene)
+            del ga_population_crossed[0][IND_SIZE - 1:]
+            ga_population_crossed[0].append(1)
+            # print "Genetic cross:\n", ga_population_crossed
+            # print "len genetic cross:", len(ga_population_crossed[0])
+
+            # time to mutate!
+            ga_population_mutated = mutate(ga_population_crossed)
+            # overwrite last digit for neural net bias
+            ga_population_mutated[-1][-1] = 1
+            # print "Mutated:\n", ga_population_mutated
+
+            # Evaluate the offspring and keep it if it is at least as fit as its parent
+            # (on a tie the offspring, so the search keeps moving across equally fit strings)
+            offspring = creator.Individual(ga_population_mutated[0])
+            offspring.fitness.values = toolbox.evaluate(offspring)
+            if offspring.fitness >= ind.fitness:
+                population[i] = offspring
+
+    return population
 
 def main():
     # create initial population
@@ -5,44 +5,98 @@
 # ML Independent Study
 # Winter 2016
 
-import random
-from letter import letter
+import bz2
+import gzip
+import os
 import numpy as np
+# xz support is in the standard library from Python 3.3; on Python 2 it needs backports.lzma
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
-# process data from file
-with open('letter-recognition.data', 'rb') as f:
-    data = f.read().split('\n')
-
-# split data in half for training and testing
-training_data = data[:10000] # data up to, not including data[10000]
-testing_data = data[10000:20000] # data from data[10000] to the end of the list
-
-# sort by letter (first element of list)
-training_data = sorted(training_data)
-testing_data = sorted(testing_data)
-
-# create a list of letters from training data
-letters_list_training = []
-for (i, training_data) in enumerate(training_data):
-    letters_list_training.append(letter(training_data.split(',')))
-#    print letters_list_training[i].value
-#    print letters_list_training[i].attributes
-
-# print letters_list_training[0].value
-# for letter in letters_list_training: print letter.value
-
-# shuffle training data
-random.shuffle(letters_list_training)
-#np.random.shuffle(letters_list_training)
-# for letter in letters_list_training: print letter.bias_input_plus_attributes
-# for ltr in letters_list_training: print ltr.attributes
-
-# create a list of letters from testing data
-letters_list_testing = []
-for (i, testing_data) in enumerate(testing_data):
-    letters_list_testing.append(letter(testing_data.split(',')))
-
-#print letters_list_testing[0].value
-#for letter in letters_list_testing: print letter.value
-random.shuffle(letters_list_testing)
-#np.random.shuffle(letters_list_testing)
+# data set location, relative to this file rather than the working directory
+data_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'letter-recognition.data')
+
+
+def open_data(path):
+    """
+    Open a data file for reading, decompressing on the fly if its name ends in
+    .gz, .bz2 or .xz, so compressed copies are read directly without being
+    decompressed to disk first
+    :param path:
+    :return binary file object:
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gz':
+        return gzip.open(path, 'rb')
+    if extension == '.bz2':
+        return bz2.BZ2File(path, 'rb')
+    if extension == '.xz':
+        if lzma is None:
+            raise IOError("reading %s needs the lzma module (pip install backports.lzma on Python 2)" % path)
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def parse_letter_text(data):
+    """
+    Parse the letter recognition data in one vectorized pass
+    Each line is a letter followed by 16 integer attributes in 0-15.
+    The letter at the start of each line is read off as a class index and
+    overwritten with a digit, newlines become commas, and numpy parses
+    the whole buffer as one comma separated list of numbers.
+    :param data: file contents
+    :return dict of features (rows x 16, uint8) and labels (class index, A = 0, int8):
+    """
+    buf = np.frombuffer(data.rstrip(), dtype=np.uint8).copy()
+    newlines = np.flatnonzero(buf == ord('\n'))
+    line_starts = np.concatenate(([0], newlines + 1))
+
+    labels = (buf[line_starts] - ord('A')).astype(np.int8)
+    buf[line_starts] = ord('0')
+    buf[newlines] = ord(',')
+    values = np.fromstring(buf.tostring(), dtype=np.int16, sep=',')
+    if values.size != len(line_starts) * 17:
+        raise ValueError("expected a letter and 16 attributes on each of %d lines, got %d values"
+                         % (len(line_starts), values.size))
+
+    features = values.reshape(len(line_starts), 17)[:, 1:].astype(np.uint8)
+    return {'features': features, 'labels': labels}
+
+
+def parse_delimited_text(data, label_column=0, delimiter=',', class_names=None):
+    """
+    Parse a UCI-style delimited data set: one row per line,
+    numeric features in every column but the label column.
+    The whole file is split into cells in one pass and the feature
+    columns are converted to numbers as a single array.
+    :param data: file contents
+    :param label_column: index of the column holding the class label (may be negative)
+    :param delimiter:
+    :param class_names: known class labels, in class index order; if None,
+    the sorted distinct labels found in the data
+    :return dict of features (rows x columns-1, float32), labels (class index, int32) and class_names:
+    """
+    lines = data.strip().splitlines()
+    cells = np.array(delimiter.join(lines).split(delimiter))
+    if cells.size % len(lines):
+        raise ValueError("rows of the data set do not all have the same number of columns")
+    cells = np.char.strip(cells.reshape(len(lines), -1))
+
+    label_cells = cells[:, label_column]
+    features = np.delete(cells, label_column % cells.shape[1], axis=1).astype(np.float32)
+    if class_names is None:
+        class_names, labels = np.unique(label_cells, return_inverse=True)
+    else:
+        class_names = np.array(class_names)
+        order = np.argsort(class_names)
+        positions = np.searchsorted(class_names, label_cells, sorter=order).clip(0, len(class_names) - 1)
+        labels = order[positions]
+        unknown = class_names[labels] != label_cells
+        if unknown.any():
+            raise ValueError("unknown class label %r" % label_cells[unknown][0])
+    return {'features': features, 'labels': labels.astype(np.int32), 'class_names': class_names}
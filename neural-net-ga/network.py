@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Neural net computations on whole matrices of rows
+# Shared by the experiments: rows are the rows of a data matrix
+# (bias input in the last column), weights are laid out as in neural_net_ga
+# (one row per unit of the next layer, bias weights of the output layer
+# in the last column of hidden_to_output_weights).
+
+from __future__ import division
+import sys
+import threading
+import numpy as np
+from activations import sigmoid
+from evaluation import Evaluation, is_evaluation_epoch
+
+
+def forward_batch(rows, input_to_hidden_weights, hidden_to_output_weights):
+    """
+    Forward propagate a batch of rows through the neural network:
+    one matrix multiply per layer for the whole batch
+    :param rows: rows x inputs matrix
+    :param input_to_hidden_weights: hidden units x inputs
+    :param hidden_to_output_weights: output units x (hidden units + 1)
+    :return hidden layer activations (rows x hidden units), output layer activations (rows x output units):
+    """
+    hidden_layer = np.dot(rows, input_to_hidden_weights.T)
+    sigmoid(hidden_layer, out=hidden_layer)
+    # bias weights are added on rather than appending a column of 1s to the hidden layer
+    output_layer = np.dot(hidden_layer, hidden_to_output_weights[:, :-1].T)
+    output_layer += hidden_to_output_weights[:, -1]
+    return hidden_layer, sigmoid(output_layer, out=output_layer)
+
+
+class InferenceEngine(object):
+    """Forward pass into activation buffers allocated once
+    The hidden and output activations of a batch are written into preallocated
+    buffers sized for max_rows rows, with the sigmoid applied in place, and rows
+    picked out of a data matrix are gathered into a preallocated input buffer, so
+    repeated evaluation (every epoch, every chromosome) does no allocation per batch.
+    The activation buffers do not depend on the number of inputs, and there is one
+    input buffer per number of inputs, so one engine serves every network with the
+    same hidden and output layers, whatever features it was given (see thread_engine).
+    Not thread safe: each thread needs its own engine.
+    The activations returned are views of the buffers: they are overwritten by the next call."""
+
+    def __init__(self, num_hidden, num_outputs, max_rows=1000, dtype=np.float64, sigmoid=sigmoid):
+        """
+        :param num_hidden: number of hidden units
+        :param num_outputs: number of output units
+        :param max_rows: number of rows the buffers hold (a larger batch grows them, see reserve)
+        :param dtype: numeric precision of the data and weights
+        :param sigmoid: sigmoid kernel (see activations.py), e.g. the lookup table (numpy only, not faster than expit)
+        """
+        self.max_rows = 0
+        self.sigmoid = sigmoid
+        self.hidden = np.empty((0, num_hidden), dtype=dtype)
+        self.output = np.empty((0, num_outputs), dtype=dtype)
+        # input rows gathered for a batch, one buffer per number of inputs
+        self.inputs = {}
+        self.reserve(max_rows)
+        # hidden -> output weights without the bias column, transposed into contiguous memory
+        self.hidden_to_output = np.empty((num_hidden, num_outputs), dtype=dtype)
+
+    def reserve(self, count):
+        """
+        Make room for a batch of count rows
+        The buffers are only reallocated for a batch larger than any before.
+        :param count: number of rows
+        """
+        if count > self.max_rows:
+            self.max_rows = count
+            self.hidden = np.empty((count, self.hidden.shape[1]), dtype=self.hidden.dtype)
+            self.output = np.empty((count, self.output.shape[1]), dtype=self.output.dtype)
+            for num_inputs in self.inputs:
+                self.inputs[num_inputs] = np.empty((count, num_inputs), dtype=self.hidden.dtype)
+
+    def gather(self, data, rows):
+        """
+        Rows of a data matrix, copied into the input buffer for its number of columns
+        (allocated the first time a network with that many inputs is evaluated)
+        :param data: data matrix, in the engine's dtype
+        :param rows: row numbers of data (at most max_rows of them, see reserve)
+        :return len(rows) x inputs view of the input buffer (overwritten by the next call):
+        """
+        num_inputs = data.shape[1]
+        inputs = self.inputs.get(num_inputs)
+        if inputs is None:
+            inputs = self.inputs[num_inputs] = np.empty((self.max_rows, num_inputs), dtype=self.hidden.dtype)
+        inputs = inputs[:len(rows)]
+        # mode='clip' writes straight into the buffer (the default mode='raise' takes into a temporary first);
+        # row numbers come from the data set's orders, so none is out of range
+        np.take(data, rows, axis=0, out=inputs, mode='clip')
+        return inputs
+
+    def forward(self, rows, input_to_hidden_weights, hidden_to_output_weights):
+        """
+        Forward propagate a batch of rows through the neural network (see forward_batch)
+        :param rows: rows x inputs matrix in the engine's dtype (more than max_rows rows grow the buffers)
+        :param input_to_hidden_weights: hidden units x inputs
+        :param hidden_to_output_weights: output units x (hidden units + 1)
+        :return hidden layer activations, output layer activations (views of the buffers):
+        """
+        count = len(rows)
+        self.reserve(count)
+        hidden = self.hidden[:count]
+        output = self.output[:count]
+        # np.dot only writes into buffers of its result's dtype; data is cast once where it is made
+        # (Dataset dtype, stream.MinibatchReader dtype), not on every batch
+        if rows.dtype != hidden.dtype:
+            raise ValueError("%s rows for a %s network: load the data in the network's dtype"
+                             % (rows.dtype, hidden.dtype))
+
+        np.dot(rows, input_to_hidden_weights.T, out=hidden)
+        self.sigmoid(hidden, out=hidden)
+
+        np.copyto(self.hidden_to_output, hidden_to_output_weights[:, :-1].T)
+        np.dot(hidden, self.hidden_to_output, out=output)
+        output += hidden_to_output_weights[:, -1]
+        self.sigmoid(output, out=output)
+        return hidden, output
+
+
+#### one engine per thread for each network shape, shared by every network the thread evaluates ####
+thread_engines = threading.local()
+
+
+def thread_engine(num_hidden, num_outputs, dtype=np.float64, sigmoid=sigmoid):
+    """
+    The calling thread's engine for networks of this shape, created on first use
+    and reused across epochs, chromosomes and networks
+    :param num_hidden: number of hidden units
+    :param num_outputs: number of output units
+    :param dtype: numeric precision of the data and weights
+    :param sigmoid: sigmoid kernel
+    :return InferenceEngine:
+    """
+    engines = getattr(thread_engines, 'engines', None)
+    if engines is None:
+        engines = thread_engines.engines = {}
+    key = (num_hidden, num_outputs, np.dtype(dtype), sigmoid)
+    engine = engines.get(key)
+    if engine is None:
+        engine = engines[key] = InferenceEngine(num_hidden, num_outputs, dtype=dtype, sigmoid=sigmoid)
+    return engine
+
+
+def back_propagation(hidden_activations, output_activations, output_layer_targets, row,
+                     input_to_hidden_weights, hidden_to_output_weights, eta, alpha,
+                     input_to_hidden_deltas=None, hidden_to_output_deltas=None):
+    """
+    The back-propagation algorithm for one training example,
+    updating all weights in the network in place (a minibatch of one row, see back_propagation_batch)
+    :param hidden_activations: activations of the hidden units
+    :param output_activations: activations of the output units
+    :param output_layer_targets: target for each output unit (.9 for the row's class, .1 otherwise)
+    :param row: input row (with bias input)
+    :param input_to_hidden_weights, hidden_to_output_weights: weights, updated in place
+    :param eta: learning rate
+    :param alpha: momentum
+    :param input_to_hidden_deltas, hidden_to_output_deltas: previous weight changes, updated in place
+    (None: no previous change, so momentum adds nothing)
+    :return output layer error terms, hidden layer error terms:
+    """
+    output_layer_error, hidden_layer_error = back_propagation_batch(
+        np.reshape(hidden_activations, (1, -1)), np.reshape(output_activations, (1, -1)),
+        np.reshape(output_layer_targets, (1, -1)), np.reshape(row, (1, -1)),
+        input_to_hidden_weights, hidden_to_output_weights, eta, alpha, input_to_hidden_deltas, hidden_to_output_deltas)
+    return output_layer_error[0], hidden_layer_error[0]
+
+
+def back_propagation_batch(hidden_activations, output_activations, output_layer_targets, rows,
+                           input_to_hidden_weights, hidden_to_output_weights, eta, alpha,
+                           input_to_hidden_deltas=None, hidden_to_output_deltas=None):
+    """
+    The back-propagation algorithm for a minibatch of training examples,
+    updating all weights in the network in place, once for the whole batch
+    Error terms, for every row of the batch:
+        output unit k: δk ← ok(1 − ok)(tk − ok)
+        hidden unit j: δj ← hj(1−hj) ( (∑ k∈output units) wkj δk )
+    Weight changes, with momentum, averaged over the rows of the batch:
+        Δw^t_ji = η*mean(δ_j*x_ji) + αΔw^(t−1)_ji
+    computed as matrix products of the error terms and the layer inputs
+    (the hidden -> output bias weights see an input of 1).
+    With one row this is the online update of a single training example.
+    :param hidden_activations: rows x hidden units activations
+    :param output_activations: rows x output units activations
+    :param output_layer_targets: rows x output units targets
+    :param rows: rows x inputs matrix (with bias input)
+    :param input_to_hidden_weights, hidden_to_output_weights: weights, updated in place
+    :param eta: learning rate
+    :param alpha: momentum
+    :param input_to_hidden_deltas, hidden_to_output_deltas: previous weight changes, updated in place
+    (None: no previous change, so momentum adds nothing)
+    :return rows x output units error terms, rows x hidden units error terms:
+    """
+    hidden = hidden_activations
+    output = output_activations
+    step = eta / len(rows)
+
+    #### 2. Calculate the error terms ####
+    output_layer_error = output * (1 - output) * (output_layer_targets - output)
+    # hidden errors use the hidden -> output weights before this batch's change
+    hidden_layer_error = hidden * (1 - hidden) * np.dot(output_layer_error, hidden_to_output_weights[:, :-1])
+
+    #### 3. change weights after each batch of training examples ####
+    #### Change weights from hidden -> output layer ####
+    hidden_to_output_change = np.empty_like(hidden_to_output_weights)
+    hidden_to_output_change[:, :-1] = np.dot(output_layer_error.T, hidden)
+    hidden_to_output_change[:, -1] = output_layer_error.sum(axis=0)
+    hidden_to_output_change *= step
+    if hidden_to_output_deltas is not None:
+        hidden_to_output_change += alpha * hidden_to_output_deltas
+        hidden_to_output_deltas[...] = hidden_to_output_change
+    hidden_to_output_weights += hidden_to_output_change
+
+    #### Change weights from input -> hidden layer ####
+    input_to_hidden_change = np.dot(hidden_layer_error.T, rows)
+    input_to_hidden_change *= step
+    if input_to_hidden_deltas is not None:
+        input_to_hidden_change += alpha * input_to_hidden_deltas
+        input_to_hidden_deltas[...] = input_to_hidden_change
+    input_to_hidden_weights += input_to_hidden_change
+
+    return output_layer_error, hidden_layer_error
+
+
+class Trainer(object):
+    """A network being trained: its weights, hyperparameters and training state
+    Everything a training run updates belongs to the trainer, so several networks
+    can be trained side by side (in threads or processes) without sharing state:
+    the weight matrices (updated in place), eta and alpha and the momentum buffers.
+    The network is evaluated with an InferenceEngine: the one it was given, or else
+    the evaluating thread's engine for its shape (see thread_engine), so the activation
+    buffers are shared by the networks a thread evaluates but never between threads.
+    The previous weight changes are kept in float buffers, one per weight matrix,
+    that persist across training examples, minibatches and epochs, so the momentum
+    term alpha*Δw^(t−1) carries over from every update to the next."""
+
+    def __init__(self, input_to_hidden_weights, hidden_to_output_weights, eta, alpha, sigmoid=sigmoid, engine=None):
+        """
+        :param input_to_hidden_weights: hidden units x inputs
+        :param hidden_to_output_weights: output units x (hidden units + 1)
+        :param eta: learning rate
+        :param alpha: momentum
+        :param sigmoid: sigmoid kernel used to evaluate the network (training uses the exact one)
+        :param engine: InferenceEngine to evaluate the network with, owned by the thread or worker using it
+        (None: the evaluating thread's engine for the network's shape and sigmoid)
+        """
+        self.input_to_hidden_weights = input_to_hidden_weights
+        self.hidden_to_output_weights = hidden_to_output_weights
+        self.eta = eta
+        self.alpha = alpha
+        # previous weight changes, in the weights' (floating point) dtype
+        self.input_to_hidden_deltas = np.zeros_like(input_to_hidden_weights)
+        self.hidden_to_output_deltas = np.zeros_like(hidden_to_output_weights)
+        self.num_outputs, self.num_hidden = hidden_to_output_weights.shape[0], hidden_to_output_weights.shape[1] - 1
+        self.sigmoid = sigmoid
+        self.own_engine = engine
+
+    @property
+    def engine(self):
+        """InferenceEngine evaluating the network"""
+        if self.own_engine is not None:
+            return self.own_engine
+        return thread_engine(self.num_hidden, self.num_outputs, self.hidden_to_output_weights.dtype, self.sigmoid)
+
+    @classmethod
+    def with_random_weights(cls, num_inputs, num_hidden, num_outputs, eta, alpha, dtype=np.float64,
+                            random_state=np.random, sigmoid=sigmoid, engine=None):
+        """
+        A network with weights drawn uniformly from [-.25, .25)
+        :param num_inputs: number of inputs (with bias input)
+        :param num_hidden: number of hidden units
+        :param num_outputs: number of output units
+        :param eta: learning rate
+        :param alpha: momentum
+        :param dtype: numeric precision of the weights
+        :param random_state: source of the random weights (np.random or a RandomState)
+        :param sigmoid: sigmoid kernel used to evaluate the network
+        :param engine: InferenceEngine to evaluate the network with (None: the evaluating thread's)
+        :return Trainer:
+        """
+        input_to_hidden_weights = random_state.uniform(low= -.25, high= .25, size=(num_hidden, num_inputs))
+        # one more column for the bias weights of the output units
+        hidden_to_output_weights = random_state.uniform(low= -.25, high= .25, size=(num_outputs, num_hidden + 1))
+        return cls(input_to_hidden_weights.astype(dtype), hidden_to_output_weights.astype(dtype), eta, alpha, sigmoid,
+                   engine)
+
+    def forward(self, rows):
+        """
+        Evaluate the network on a batch of rows (see InferenceEngine.forward)
+        :param rows: rows x inputs matrix
+        :return hidden layer activations, output layer activations (overwritten by the next call):
+        """
+        return self.engine.forward(rows, self.input_to_hidden_weights, self.hidden_to_output_weights)
+
+    def predict(self, data, rows=None):
+        """
+        The network's vote (highest valued output unit) for rows of data,
+        forward propagated in chunks of at most engine.max_rows rows, so only one
+        chunk of rows and activations is held at a time whatever the number of rows
+        (rows picked by number are gathered into the engine's input buffer, see InferenceEngine.gather)
+        :param data: data matrix, in the network's dtype
+        :param rows: row numbers of data to evaluate (None: every row)
+        :return vector of class indices, one per row:
+        """
+        engine = self.engine
+        count = len(data) if rows is None else len(rows)
+        votes = np.empty(count, dtype=np.intp)
+        for start in xrange(0, count, engine.max_rows):
+            stop = min(start + engine.max_rows, count)
+            chunk = data[start:stop] if rows is None else engine.gather(data, rows[start:stop])
+            hidden_layer, Y = engine.forward(chunk, self.input_to_hidden_weights, self.hidden_to_output_weights)
+            np.argmax(Y, axis=1, out=votes[start:stop])
+        return votes
+
+    def evaluate(self, data, classes, rows=None):
+        """
+        Confusion matrix of the votes for rows of data against their classes
+        :param data: data matrix
+        :param classes: class index of every row of data
+        :param rows: row numbers of data to evaluate (None: every row)
+        :return evaluation.Evaluation (accuracy, per-class precision and recall):
+        """
+        if rows is not None:
+            classes = classes[rows]
+        return Evaluation.of_votes(classes, self.predict(data, rows), self.num_outputs)
+
+    def accuracy(self, data, classes, rows=None):
+        """
+        Fraction of rows of data whose vote is the row's class (see evaluate)
+        :return accuracy:
+        """
+        return self.evaluate(data, classes, rows).accuracy
+
+    def train_rows(self, rows, output_layer_targets, batch_size=1, classes=None):
+        """
+        One pass of (minibatch) stochastic gradient descent over rows, in order:
+        forward propagate batch_size rows at a time and back-propagate their averaged weight changes
+        (batch_size 1 is online training, updating the weights after every example)
+        If classes are given, the pass also scores the network on the rows from the activations
+        it already computed for training: each row's vote and error are those of the forward pass
+        just before its own weight update (a running score, while the weights change).
+        :param rows: rows x inputs matrix (with bias input)
+        :param output_layer_targets: rows x output units targets
+        :param batch_size: number of rows per weight update
+        :param classes: class index of every row, to score the pass
+        :return None, or if classes are given, evaluation.Evaluation of the pass
+        with loss = sum over rows of the error E = 1/2 * sum over output units of (t - o)^2:
+        """
+        if classes is not None:
+            # output activations of every row, scored once the pass is over
+            outputs = np.empty((len(rows), self.num_outputs), dtype=self.hidden_to_output_weights.dtype)
+        for start in xrange(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            targets = output_layer_targets[start:start + batch_size]
+            hidden_layer, Y = forward_batch(batch, self.input_to_hidden_weights, self.hidden_to_output_weights)
+            if classes is not None:
+                outputs[start:start + batch_size] = Y
+            back_propagation_batch(hidden_layer, Y, targets, batch,
+                                   self.input_to_hidden_weights, self.hidden_to_output_weights, self.eta, self.alpha,
+                                   self.input_to_hidden_deltas, self.hidden_to_output_deltas)
+        if classes is not None:
+            loss = 0.5 * np.square(output_layer_targets - outputs).sum()
+            return Evaluation.of_votes(classes, np.argmax(outputs, axis=1), outputs.shape[1], loss)
+
+    def reset_momentum(self):
+        """Forget the previous weight changes (e.g. before training on a new task)"""
+        self.input_to_hidden_deltas.fill(0)
+        self.hidden_to_output_deltas.fill(0)
+
+
+######################################################################################################
+
+#### training loop shared by the experiments ####
+
+def train_epochs(trainer, num_epochs, epoch_batches, evaluate, batch_size=1, evaluations=None,
+                 running_training_accuracy=False, evaluate_every=1, evaluation_rows=None):
+    """
+    Train a network for num_epochs epochs, evaluating it on the training set and the test set
+    every evaluate_every epochs and after the last one
+    Each epoch is one pass of Trainer.train_rows over the epoch's minibatches; momentum
+    carries over from every weight update to the next, across minibatches and epochs.
+    :param trainer: Trainer, trained in place
+    :param num_epochs:
+    :param epoch_batches: function taking an epoch number (from 0) and returning that epoch's
+    source of (rows, classes, output targets) minibatches, in training order (e.g. Dataset.epoch_batches)
+    :param evaluate: function taking (training, sample_size) and returning the network's (training, test)
+    evaluation.Evaluation: training False when the training set was scored during the epoch (its evaluation
+    is then None), sample_size the number of rows to evaluate (None: every row); e.g. Dataset.evaluator
+    :param batch_size: number of training instances per weight update (1: update after every instance)
+    :param evaluations: optional list to store every evaluated epoch's (training, test) evaluation.Evaluation in:
+    confusion matrix and per-class precision and recall, for later analysis
+    :param running_training_accuracy: if True, score the training set from the activations computed while
+    training on it (votes and loss of each row just before its weight update) instead of a second
+    forward pass over it
+    :param evaluate_every: evaluate every evaluate_every epochs (None or 0: only after the last epoch)
+    :param evaluation_rows: if given, evaluate on a fixed sample of this many training and test rows,
+    except after the last epoch, which is always evaluated on every row
+    :return training accuracy list, testing accuracy list, one entry per evaluated epoch
+    (see evaluation.evaluation_epochs):
+    """
+    training_acc_list = []
+    testing_acc_list = []
+    for epoch in xrange(num_epochs):
+        sys.stdout.write("\rEpoch %d/%d" % (epoch + 1, num_epochs))
+
+        # forward propagate batch_size training instances at once and
+        # use back propagation to compute their error and adjust weights
+        # (scoring the network on the training rows as it goes, if running_training_accuracy)
+        running_evaluation = Evaluation(np.zeros((trainer.num_outputs, trainer.num_outputs), dtype=np.intp), 0.0)
+        for rows, classes, output_targets in epoch_batches(epoch):
+            batch_evaluation = trainer.train_rows(rows, output_targets, batch_size,
+                                                  classes if running_training_accuracy else None)
+            if running_training_accuracy:
+                running_evaluation += batch_evaluation
+
+        if not is_evaluation_epoch(epoch + 1, num_epochs, evaluate_every):
+            continue
+        # the training set only if it was not scored during training;
+        # a sample of the rows, if evaluation_rows, except after the last epoch
+        sample_size = evaluation_rows if epoch + 1 < num_epochs else None
+        training_evaluation, testing_evaluation = evaluate(not running_training_accuracy, sample_size)
+        if running_training_accuracy:
+            training_evaluation = running_evaluation
+        if evaluations is not None:
+            evaluations.append((training_evaluation, testing_evaluation))
+        training_acc_list.append(training_evaluation.accuracy)
+        testing_acc_list.append(testing_evaluation.accuracy)
+    return training_acc_list, testing_acc_list
+
+
+def evaluate_batches(trainer, batches, columns=None):
+    """
+    Evaluation over a source of (rows, classes, output targets) minibatches,
+    forward propagating and counting votes one minibatch at a time
+    :param trainer: network being evaluated
+    :param batches:
+    :param columns: columns of the rows the network takes (None: every column)
+    :return evaluation.Evaluation of all the rows (accuracy, confusion matrix, per-class precision and recall):
+    """
+    evaluation = Evaluation(np.zeros((trainer.num_outputs, trainer.num_outputs), dtype=np.intp))
+    for rows, classes, output_targets in batches:
+        # the minibatches' confusion matrices add up
+        evaluation += trainer.evaluate(rows if columns is None else rows[:, columns], classes)
+    return evaluation
+
+
+def batches_evaluator(trainer, training_batches, testing_batches, columns=None):
+    """
+    Evaluation function for train_epochs on sources of minibatches (e.g. stream.MinibatchReader),
+    which are always evaluated in full
+    :param trainer: network being trained
+    :param training_batches, testing_batches:
+    :param columns: columns of the rows the network takes (None: every column)
+    :return function taking (training, sample_size) and returning the (training, test) evaluations:
+    """
+    def evaluate(training, sample_size):
+        training_evaluation = evaluate_batches(trainer, training_batches, columns) if training else None
+        return training_evaluation, evaluate_batches(trainer, testing_batches, columns)
+    return evaluate
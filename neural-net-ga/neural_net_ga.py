@@ -7,11 +7,11 @@
 # Winter 2016
 # neural net code modified from ML HW 2
 
-from input import letters_list_training, letters_list_testing
-# preprocessing to scale training data
-from sklearn import preprocessing
+from dataset import get_dataset
+from network import Trainer
+import activations
 from genetic_algorithm import *
-import sys, math, random, numpy as np
+import os, sys, math, random, numpy as np
 import warnings
 warnings.simplefilter(action = "ignore", category = FutureWarning)
 warnings.simplefilter(action = "ignore", category = UserWarning)
@@ -36,6 +36,9 @@ eta = 0.3
 alpha = 0.3
 # number of hidden units
 n = 4
+# numeric precision of the data, weights and activations
+# (float32 halves memory and bandwidth; set NEURAL_NET_GA_DTYPE=float32)
+dtype = np.dtype(os.environ.get('NEURAL_NET_GA_DTYPE', 'float64'))
 
 # ################
 # # Experiment 2 #
@@ -85,11 +88,12 @@ n = 4
 # This is useful in deriving the back-propagation algorithm
 # If derivative argument is true, return the derivative of the sigmoid
 # Derivative is not needed for this assignment, we use equations from the slides instead
+# (computed with the overflow-safe kernel from activations.py)
 def sigmoid(z, derivative):
     if derivative:
-        return sigmoid(z) * (1-sigmoid(z))
+        return activations.sigmoid_derivative(z)
     else:  # derivative is False
-        return 1 / (1+np.exp(-z))
+        return activations.sigmoid(z)
 
 
 ######################################################################
@@ -114,70 +118,43 @@ def get_num_features(ga_population):
 
 ######################################################################################################
 
-#### Training data as a 10000x17 matrix seeded with letter attributes ####
-# Rows in data matrices correspond to number of items in minibatch
-# columns correspond to values of these items (values of xi for all items X in training data)
-# numpy stores data in row major order
-X_attributes = np.full( (len(letters_list_training),16), [ltr.attributes for ltr in letters_list_training] )
-
-#### save targets in the order entered into the matrix ####
-X_targets = np.array([list(ltr.value) for ltr in letters_list_training])
-
-#### preprocessing input using sklearn package, returns array ####
-# scaled to be Gaussian with zero mean and unit variance along each column (feature)
-X_scaled = preprocessing.scale(X_attributes)
-# print X_scaled.shape  # 10000 x 16
-
-#### Concatenate scaled data with the 1s needed for bias inputs ####
-# put bias input at the end so we don't need to worry about indexing [1:25]
-# when going from hidden -> output layer
-bias_input = np.full((len(letters_list_training), 1), 1.0)
-# print bias_input.shape
-X = np.concatenate((X_scaled, bias_input), axis=1)
-
-######################################################################################################
-
-#### Testing data as a 10000x17 matrix seeded with letter attributes ####
-# Rows in data matrices correspond to number of items in minibatch
-# columns correspond to values of these items (values of xi for all items X in testing data)
-X_test_attributes = np.full( (len(letters_list_testing),16), [ltr.attributes for ltr in letters_list_testing] )
-
-#### save targets in the order entered into the matrix ####
-X_test_targets = np.array([list(ltr.value) for ltr in letters_list_testing])
-
-#### preprocessing input using sklearn package, returns array ####
-# scaled to be Gaussian with zero mean and unit variance along each column (feature)
-# Scale the test data using the μi and σi values
-# computed from the training data (X_attributes), not the test data.
-scaler = preprocessing.StandardScaler().fit(X_attributes)
-X_test_scaled = scaler.transform(X_test_attributes)
-
-#### Concatenate scaled data with the 1s needed for bias inputs ####
-# put bias input at the end so we don't need to worry about indexing [1:25]
-# when going from hidden -> output layer
-test_bias_input = np.full((len(letters_list_testing), 1), 1.0)
-# print test_bias_input.shape
-X_test = np.concatenate((X_test_scaled, test_bias_input), axis=1)
+#### Letter data set ####
+# loaded on first use of letters.X, letters.X_test, ... rather than at import
+# Set NEURAL_NET_GA_SHARED_DATA to a directory to share a single copy of the matrices
+# between processes (e.g. parallel GA fitness evaluation or experiment rounds):
+# the first process to use them writes them there, and every process
+# maps them read-only, so workers do no parsing or scaling at startup
+# Set NEURAL_NET_GA_DATASET to the name of another registered data set (see registry.py)
+# to run the pipeline on it instead of the letter data
+# Set NEURAL_NET_GA_SEED to replay a run's shuffles (letters.seed holds the seed a run drew)
+letters = get_dataset(os.environ.get('NEURAL_NET_GA_DATASET', 'letter'),
+                      seed=int(os.environ['NEURAL_NET_GA_SEED']) if 'NEURAL_NET_GA_SEED' in os.environ else None,
+                      dtype=dtype, shared_dir=os.environ.get('NEURAL_NET_GA_SHARED_DATA'))
 
 ######################################################################################################
 
-#### Weight matrix input -> hidden layer ####
+#### Networks ####
+# Every training run creates its own network (see network.Trainer), holding its weights,
+# eta, alpha and training state, so runs never share or contaminate each other's weights
 # Weight matrices have the same number of columns as units in the previous layer
 # and the same number of rows as units in the next layer
 # n is the number of hidden units
-#### creation of # input_to_hidden_weights moved to experiment code (train_and_test) to make it
-#### dynamic for the number of features for each GA string
-#### input_to_hidden_weights = np.random.uniform(low= -.25, high= .25, size=(n, num_features))
-# print "input to hidden weights shape", input_to_hidden_weights.shape #4x17
+#### input -> hidden weights are created per GA string (train_and_test), with one column per selected feature
+#### hidden -> output weights have one more column than hidden units to allow for bias input
 
-#### Weights from hidden layer to output layer ####
-# 5 columns to allow for bias input (one column of 1s)
-hidden_to_output_weights = np.random.uniform(low= -.25, high= .25, size=(26,n+1) )
+# Set NEURAL_NET_GA_INFERENCE_SIGMOID to a kernel name from activations.py (e.g. table)
+# to evaluate with it instead of the exact sigmoid used for training
+inference_sigmoid = activations.get_kernel(os.environ.get('NEURAL_NET_GA_INFERENCE_SIGMOID', 'exact'))
 
-######################################################################################################
 
-#### Output layer matrix, 1 row by 26 columns for 26 letters of the alphabet ####
-# only 1 row, only need one output (activations) for output layer
-# don't initialize to anything
-# target for properly identified letter is .9, and the rest of the units should be .1
-Y = np.full((1, 26), None)
\ No newline at end of file
+def create_trainer(num_inputs, num_hidden=n, eta=eta, alpha=alpha):
+    """
+    New network for the data set, with random initial weights
+    :param num_inputs: number of inputs (features, with bias input)
+    :param num_hidden: number of hidden units
+    :param eta: learning rate
+    :param alpha: momentum
+    :return network.Trainer:
+    """
+    return Trainer.with_random_weights(num_inputs, num_hidden, letters.num_classes, eta, alpha, dtype=dtype,
+                                       sigmoid=inference_sigmoid)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Registry of data sets the GA feature selection pipeline can run on
+# A descriptor says where a data set lives and how to parse it; everything
+# the network and GA need to know about its shape (chromosome length,
+# input width, output width) is derived from it by Dataset, from the data
+# itself when the descriptor does not state it.
+
+import string
+from functools import partial
+from input import data_file, open_data, parse_letter_text, parse_delimited_text
+
+
+class DatasetSpec(object):
+    """Descriptor of a delimited data file with one class label per row"""
+
+    def __init__(self, name, path, label_column=0, delimiter=',', class_names=None, num_features=None,
+                 training_rows=None, testing_rows=None, parse=None):
+        """
+        :param name: name the data set is registered under
+        :param path: data file, optionally .gz/.bz2/.xz compressed
+        :param label_column: column holding the class label
+        :param delimiter: column delimiter
+        :param class_names: class labels in output unit order, if known in advance
+        (needed for streaming, where no single pass sees every label)
+        :param num_features: number of feature columns, if known in advance
+        :param training_rows: rows from the start of the file used for training (default: first half)
+        :param testing_rows: rows following them used for testing (default: the rest)
+        :param parse: function parsing the file contents into a dict of features and labels
+        (default: parse_delimited_text with label_column, delimiter and class_names)
+        """
+        self.name = name
+        self.path = path
+        self.label_column = label_column
+        self.delimiter = delimiter
+        self.class_names = class_names
+        self.num_features = num_features
+        self.training_rows = training_rows
+        self.testing_rows = testing_rows
+        if parse is None:
+            parse = partial(parse_delimited_text, label_column=label_column, delimiter=delimiter,
+                            class_names=class_names)
+        self.parse = parse
+
+    @property
+    def cache_key(self):
+        """everything besides the data file that the parsed arrays depend on"""
+        parse = getattr(self.parse, 'func', self.parse)
+        return '%s,%s,%r,%r,%r' % (self.name, getattr(parse, '__name__', type(parse).__name__), self.label_column,
+                                   self.delimiter, self.class_names)
+
+    def parse_file(self, path):
+        """
+        :param path: data file, optionally .gz/.bz2/.xz compressed
+        :return dict of features and labels (and class_names, if the parser found them):
+        """
+        with open_data(path) as f:
+            return self.parse(f.read())
+
+
+#### data sets registered in this process, by name ####
+registry = {}
+
+
+def register_dataset(spec):
+    """
+    Make a data set available to get_dataset(name)
+    :param spec: DatasetSpec
+    :return spec:
+    """
+    registry[spec.name] = spec
+    return spec
+
+
+def get_spec(name):
+    """
+    :param name: registered data set name
+    :return DatasetSpec:
+    """
+    try:
+        return registry[name]
+    except KeyError:
+        raise KeyError("no data set registered as %r (registered: %s)" % (name, ', '.join(sorted(registry))))
+
+
+#### UCI letter recognition data set: a letter followed by 16 integer attributes ####
+register_dataset(DatasetSpec('letter', data_file, class_names=list(string.ascii_uppercase), num_features=16,
+                             training_rows=10000, testing_rows=10000, parse=parse_letter_text))
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Streaming minibatch reader for registered data sets
+# that are too large to hold in memory as a whole.
+# The file is read in fixed-size chunks of lines, each chunk is parsed with the
+# vectorized parser, scaled with statistics from a first pass over the data
+# and handed out with the bias input column already appended,
+# so peak memory is bounded by the chunk size rather than the data set size.
+
+import itertools
+import os
+import numpy as np
+from input import open_data
+from registry import get_spec
+from dataset import output_targets
+
+
+def iter_chunks(path, chunk_rows, start=0, stop=None, parse=None):
+    """
+    Parse lines [start, stop) of a data file, chunk_rows lines at a time
+    Compressed files are decompressed as they are read (see open_data)
+    :param path:
+    :param chunk_rows: number of lines per chunk
+    :param start: first line to read
+    :param stop: line to stop before (None reads to the end of the file)
+    :param parse: parser for the file's format (default: the letter data parser)
+    :return generator of (features, labels) arrays for each chunk:
+    """
+    if parse is None:
+        parse = get_spec('letter').parse
+    with open_data(path) as f:
+        lines = itertools.islice(f, start, stop)
+        while True:
+            chunk = b''.join(itertools.islice(lines, chunk_rows))
+            if not chunk.strip():
+                break
+            arrays = parse(chunk)
+            yield arrays['features'], arrays['labels']
+
+
+class OnlineScaler(object):
+    """Standard scaler fitted one chunk at a time
+    keeps a running count, mean and sum of squared deviations per feature,
+    merging each chunk's statistics into them (Chan et al.'s pairwise update),
+    and scales to zero mean and unit variance like Dataset.build_matrices"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+    def partial_fit(self, features):
+        """
+        Update the running statistics with a chunk of rows
+        :param features: rows x features
+        :return self:
+        """
+        chunk = np.asarray(features, dtype=float)
+        chunk_count = len(chunk)
+        if chunk_count == 0:
+            return self
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = ((chunk - chunk_mean) ** 2).sum(axis=0)
+        if self.count == 0:
+            self.count, self.mean, self.m2 = chunk_count, chunk_mean, chunk_m2
+            return self
+
+        total = self.count + chunk_count
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * chunk_count / total
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * self.count * chunk_count / total
+        self.count = total
+        return self
+
+    @property
+    def std(self):
+        """population standard deviation per feature; constant features get 1 (as in Dataset)"""
+        std = np.sqrt(self.m2 / self.count)
+        std[std == 0.0] = 1.0
+        return std
+
+    def transform_with_bias(self, features, dtype=np.float64):
+        """
+        Scale a chunk of rows and append the bias input column of 1s
+        :param features: rows x features
+        :param dtype: numeric precision of the result
+        :return rows x (features + 1) array:
+        """
+        rows, columns = features.shape
+        out = np.empty((rows, columns + 1), dtype=dtype)
+        np.subtract(features, self.mean, out=out[:, :columns])
+        out[:, :columns] /= self.std
+        out[:, columns] = 1.0
+        return out
+
+
+def fit_scaler(path, chunk_rows=10000, start=0, stop=None, parse=None):
+    """
+    First pass over the data: fit the scaler chunk by chunk
+    :param path:
+    :param chunk_rows:
+    :param start, stop: range of lines to fit on (the training rows)
+    :param parse: parser for the file's format
+    :return OnlineScaler:
+    """
+    scaler = OnlineScaler()
+    for features, labels in iter_chunks(path, chunk_rows, start, stop, parse):
+        scaler.partial_fit(features)
+    return scaler
+
+
+class MinibatchReader(object):
+    """Re-iterable source of scaled, bias-augmented minibatches
+    Every iteration (one per epoch) reads the file again from disk, so only
+    one chunk is held in memory at a time.
+    Yields (rows, classes, output targets) with the same layout as
+    Dataset.X, Dataset.X_classes and Dataset.X_output_targets."""
+
+    def __init__(self, path, batch_size=1000, start=0, stop=None, scaler=None, name='letter', dtype=None):
+        """
+        :param path: data file
+        :param batch_size: number of rows per minibatch
+        :param start, stop: range of lines to read
+        :param scaler: fitted scaler; if None, fit one on these lines (first pass).
+        Pass the training reader's scaler to a test reader so the test data is scaled
+        with the training statistics.
+        :param name: registered data set the file is in the format of; its descriptor
+        must list the class names, since no single chunk is guaranteed to contain every class
+        :param dtype: numeric precision of the minibatches
+        (None: the pipeline's, set by NEURAL_NET_GA_DTYPE, so they match the network's weights and buffers)
+        """
+        spec = get_spec(name)
+        if spec.class_names is None:
+            raise ValueError("data set %r must be registered with class_names to be streamed" % name)
+        self.path = path
+        self.batch_size = batch_size
+        self.start = start
+        self.stop = stop
+        self.parse = spec.parse
+        self.dtype = np.dtype(dtype if dtype is not None else os.environ.get('NEURAL_NET_GA_DTYPE', 'float64'))
+        self.num_classes = len(spec.class_names)
+        if scaler is None:
+            scaler = fit_scaler(path, batch_size, start, stop, self.parse)
+        self.scaler = scaler
+
+    def __iter__(self):
+        for features, labels in iter_chunks(self.path, self.batch_size, self.start, self.stop, self.parse):
+            classes = labels.astype(np.intp)
+            yield (self.scaler.transform_with_bias(features, self.dtype), classes,
+                   output_targets(classes, self.num_classes, self.dtype))
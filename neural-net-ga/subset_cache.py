@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Cache of the input matrices for GA-selected feature subsets
+# The same chromosome is trained and tested every epoch, every round and
+# whenever it reappears in the population, so the column-gathered copy of
+# the data for its feature subset is built once and reused, least recently
+# used subsets being dropped when the cache grows past its memory budget.
+
+from collections import OrderedDict
+import numpy as np
+
+# default memory budget for cached subset matrices, in bytes
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def selected_columns(ga_pop):
+    """
+    Columns of a data matrix row selected by a GA population:
+    for each individual, in order, the columns whose gene is 1
+    :param ga_pop: GA population (list of individuals of 0/1 genes)
+    :return column numbers:
+    """
+    return np.concatenate([np.flatnonzero(individual) for individual in ga_pop]).astype(np.intp)
+
+
+class SubsetCache(object):
+    """Training and test matrices restricted to a feature subset, keyed on the subset's columns
+    Each entry is one contiguous array holding the selected columns of every
+    training row followed by every test row (the layout of the data set's matrix),
+    gathered with a single np.take into a preallocated buffer."""
+
+    def __init__(self, dataset, memory_budget=MEMORY_BUDGET):
+        """
+        :param dataset: Dataset whose scaled matrices are gathered from
+        :param memory_budget: most bytes of subset matrices kept at once
+        """
+        self.dataset = dataset
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ga_pop):
+        """
+        :param ga_pop: GA population selecting the features
+        :return the subset's training matrix and test matrix (views of one cached array):
+        """
+        columns = selected_columns(ga_pop)
+        key = columns.tostring()
+        subset = self.entries.pop(key, None)
+        if subset is None:
+            self.misses += 1
+            subset = self.gather(columns)
+        else:
+            self.hits += 1
+            self.nbytes -= subset.nbytes
+        self.store(key, subset)
+        training_rows = self.dataset.training_rows
+        return subset[:training_rows], subset[training_rows:]
+
+    def gather(self, columns):
+        """
+        :param columns: column numbers of the data matrix
+        :return rows x len(columns) contiguous array of those columns:
+        """
+        data = self.dataset.matrices['data']
+        subset = np.empty((len(data), len(columns)), dtype=data.dtype)
+        np.take(data, columns, axis=1, out=subset)
+        return subset
+
+    def store(self, key, subset):
+        """
+        Make subset the most recently used entry, evicting the least recently used
+        entries while over budget (a subset larger than the whole budget is not kept)
+        :param key:
+        :param subset:
+        """
+        if subset.nbytes > self.memory_budget:
+            return
+        while self.entries and self.nbytes + subset.nbytes > self.memory_budget:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        self.entries[key] = subset
+        self.nbytes += subset.nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
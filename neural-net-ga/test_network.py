@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+# Checks of the vectorized back-propagation against the per-weight loops it replaced
+# (benchmark.loop_back_propagation), with momentum carried between updates
+# and minibatches of more than one row. Fails on any divergence.
+#   python -m unittest test_network
+
+import unittest
+import numpy as np
+from benchmark import loop_back_propagation
+from network import forward_batch, back_propagation, back_propagation_batch, Trainer
+
+num_inputs, num_hidden, num_outputs = 7, 4, 5
+eta, alpha = 0.3, 0.6
+
+
+def random_network(random_state):
+    """
+    :param random_state:
+    :return input -> hidden weights, hidden -> output weights, data rows, their output layer targets:
+    """
+    input_to_hidden_weights = random_state.uniform(-.25, .25, size=(num_hidden, num_inputs))
+    hidden_to_output_weights = random_state.uniform(-.25, .25, size=(num_outputs, num_hidden + 1))
+    rows = random_state.normal(size=(24, num_inputs))
+    rows[:, -1] = 1.0
+    targets = np.full((len(rows), num_outputs), 0.1)
+    targets[np.arange(len(rows)), random_state.randint(0, num_outputs, len(rows))] = 0.9
+    return input_to_hidden_weights, hidden_to_output_weights, rows, targets
+
+
+def loop_training(input_to_hidden_weights, hidden_to_output_weights, rows, targets, batch_size,
+                  input_to_hidden_deltas, hidden_to_output_deltas):
+    """
+    Reference training pass: one loop update per minibatch, on plain lists of lists
+    :return input -> hidden weights, hidden -> output weights after the pass:
+    """
+    weights = input_to_hidden_weights.tolist(), hidden_to_output_weights.tolist()
+    deltas = input_to_hidden_deltas.tolist(), hidden_to_output_deltas.tolist()
+    for start in xrange(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        hidden, output = forward_batch(batch, np.array(weights[0]), np.array(weights[1]))
+        loop_back_propagation(hidden.tolist(), output.tolist(), targets[start:start + batch_size].tolist(),
+                              batch.tolist(), weights[0], weights[1], eta, alpha, deltas[0], deltas[1])
+    return np.array(weights[0]), np.array(weights[1])
+
+
+class BackPropagationTest(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        self.input_to_hidden_weights, self.hidden_to_output_weights, self.rows, self.targets = \
+            random_network(random_state)
+        # a previous update's weight changes, so the momentum term is not zero
+        self.input_to_hidden_deltas = random_state.uniform(-.01, .01, size=self.input_to_hidden_weights.shape)
+        self.hidden_to_output_deltas = random_state.uniform(-.01, .01, size=self.hidden_to_output_weights.shape)
+
+    def assert_same_training(self, batch_size):
+        """train_rows matches the loops, weights and momentum buffers carried from batch to batch"""
+        trainer = Trainer(self.input_to_hidden_weights.copy(), self.hidden_to_output_weights.copy(), eta, alpha)
+        trainer.input_to_hidden_deltas[...] = self.input_to_hidden_deltas
+        trainer.hidden_to_output_deltas[...] = self.hidden_to_output_deltas
+        trainer.train_rows(self.rows, self.targets, batch_size)
+
+        input_to_hidden, hidden_to_output = loop_training(
+            self.input_to_hidden_weights, self.hidden_to_output_weights, self.rows, self.targets, batch_size,
+            self.input_to_hidden_deltas, self.hidden_to_output_deltas)
+        np.testing.assert_allclose(trainer.input_to_hidden_weights, input_to_hidden, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(trainer.hidden_to_output_weights, hidden_to_output, rtol=0, atol=1e-12)
+
+    def test_online_training(self):
+        self.assert_same_training(1)
+
+    def test_minibatch_training(self):
+        self.assert_same_training(5)
+
+    def test_whole_batch_training(self):
+        self.assert_same_training(len(self.rows))
+
+    def test_batch_update(self):
+        """one minibatch update: weights and momentum buffers"""
+        batch = self.rows[:6]
+        weights = self.input_to_hidden_weights.copy(), self.hidden_to_output_weights.copy()
+        deltas = self.input_to_hidden_deltas.copy(), self.hidden_to_output_deltas.copy()
+        hidden, output = forward_batch(batch, *weights)
+        back_propagation_batch(hidden, output, self.targets[:6], batch, weights[0], weights[1], eta, alpha,
+                               deltas[0], deltas[1])
+
+        loop_weights = self.input_to_hidden_weights.tolist(), self.hidden_to_output_weights.tolist()
+        loop_deltas = self.input_to_hidden_deltas.tolist(), self.hidden_to_output_deltas.tolist()
+        loop_back_propagation(hidden.tolist(), output.tolist(), self.targets[:6].tolist(), batch.tolist(),
+                              loop_weights[0], loop_weights[1], eta, alpha, loop_deltas[0], loop_deltas[1])
+        for vectorized, loops in zip(weights + deltas, loop_weights + loop_deltas):
+            np.testing.assert_allclose(vectorized, loops, rtol=0, atol=1e-12)
+
+    def test_online_wrapper(self):
+        """back_propagation of one row is a minibatch of that row"""
+        row, target = self.rows[0], self.targets[0]
+        weights = self.input_to_hidden_weights.copy(), self.hidden_to_output_weights.copy()
+        batch_weights = self.input_to_hidden_weights.copy(), self.hidden_to_output_weights.copy()
+        deltas = self.input_to_hidden_deltas.copy(), self.hidden_to_output_deltas.copy()
+        batch_deltas = self.input_to_hidden_deltas.copy(), self.hidden_to_output_deltas.copy()
+        hidden, output = forward_batch(row[np.newaxis], *weights)
+        back_propagation(hidden[0], output[0], target, row, weights[0], weights[1], eta, alpha, *deltas)
+        back_propagation_batch(hidden, output, target[np.newaxis], row[np.newaxis],
+                               batch_weights[0], batch_weights[1], eta, alpha, *batch_deltas)
+        for single, batch in zip(weights + deltas, batch_weights + batch_deltas):
+            np.testing.assert_array_equal(single, batch)
+
+
+if __name__ == '__main__':
+    unittest.main()